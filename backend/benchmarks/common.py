@@ -0,0 +1,59 @@
+"""Shared statistics and reporting helpers for the benchmark scripts."""
+import json
+import statistics
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_by_endpoint, errors_by_endpoint, elapsed):
+    """Build {endpoint: {count, errors, rps, p50, p95, p99}} from latencies in ms."""
+    report = {}
+    for endpoint, samples in sorted(samples_by_endpoint.items()):
+        if not samples:
+            continue
+        report[endpoint] = {
+            "count": len(samples),
+            "errors": errors_by_endpoint.get(endpoint, 0),
+            "rps": len(samples) / elapsed,
+            "p50": statistics.median(samples),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+        }
+    return report
+
+
+def print_report(report, baseline=None):
+    print(f"{'endpoint':<40} {'count':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for endpoint, row in report.items():
+        line = (
+            f"{endpoint:<40} {row['count']:>7} {row['errors']:>5} {row['rps']:>8.1f} "
+            f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f}"
+        )
+        if baseline and endpoint in baseline:
+            change = (row["p99"] - baseline[endpoint]["p99"]) / baseline[endpoint]["p99"] * 100
+            line += f"  p99 {change:+.0f}%"
+        print(line)
+
+
+def find_regressions(report, baseline, tolerance):
+    """Endpoints whose p99 grew by more than tolerance (e.g. 0.1 for 10%)."""
+    regressions = []
+    for endpoint, row in report.items():
+        base = baseline.get(endpoint)
+        if base and row["p99"] > base["p99"] * (1 + tolerance):
+            regressions.append(endpoint)
+    return regressions
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_report(path, report):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
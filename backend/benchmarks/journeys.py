@@ -0,0 +1,148 @@
+"""Drive scripted student journeys and report per-endpoint throughput and latency.
+
+Each virtual user repeatedly logs in as a random seeded student and walks
+login -> dashboard -> enrolled courses -> upcoming sessions -> materials.
+
+Against a running server seeded with benchmarks/seed.py:
+    python benchmarks/journeys.py --base-url http://localhost:5000 --students 100000
+
+Fully in memory (needs mongomock-motor; seeds its own data, runs the app in-process):
+    python benchmarks/journeys.py --in-memory --students 500 --courses 50
+
+Save a run with --save-baseline results.json and compare later runs with
+--baseline results.json; the exit status is 1 if any endpoint's p99 regressed
+by more than --tolerance.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from common import find_regressions, load_report, print_report, save_report, summarize
+from seed import BENCH_PASSWORD, seed, student_email
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client, label, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+        self.samples[label].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+            return None
+        return response
+
+
+async def journey(client, recorder, email):
+    response = await recorder.request(
+        client, "POST /token", "POST", "/token",
+        data={"username": email, "password": BENCH_PASSWORD},
+    )
+    if response is None:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await recorder.request(client, "GET /users/me", "GET", "/users/me", headers=headers)
+    if response is None:
+        return
+    grade = response.json().get("class_level")
+
+    await recorder.request(
+        client, "GET /courses", "GET", "/courses",
+        headers=headers, params={"grade": grade} if grade else None,
+    )
+    response = await recorder.request(
+        client, "GET /course/enrolled", "GET", "/course/enrolled", headers=headers
+    )
+    await recorder.request(
+        client, "GET /sessions/upcoming", "GET", "/sessions/upcoming", headers=headers
+    )
+    if response is not None and response.json():
+        course_id = response.json()[0]["id"]
+        await recorder.request(
+            client, "GET /courses/{course_id}/materials", "GET",
+            f"/courses/{course_id}/materials", headers=headers,
+        )
+
+
+async def virtual_user(client, recorder, students, deadline, rng):
+    while time.monotonic() < deadline:
+        await journey(client, recorder, student_email(rng.randrange(students)))
+
+
+async def in_memory_client(args):
+    from mongomock_motor import AsyncMongoMockClient
+
+    import main
+
+    main.db = main.catalog_db = AsyncMongoMockClient().learnlive
+    await main.ensure_indexes()
+    await seed(
+        main.db,
+        main.get_password_hash(BENCH_PASSWORD),
+        students=args.students,
+        teachers=max(1, args.courses // 4),
+        courses=args.courses,
+    )
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--students", type=int, default=1000, help="number of seeded students")
+    parser.add_argument("--courses", type=int, default=200, help="courses to seed with --in-memory")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.in_memory:
+        client = await in_memory_client(args)
+    else:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30)
+
+    recorder = Recorder()
+    start = time.monotonic()
+    deadline = start + args.duration
+    async with client:
+        await asyncio.gather(*(
+            virtual_user(client, recorder, args.students, deadline, random.Random(args.seed + i))
+            for i in range(args.users)
+        ))
+    elapsed = time.monotonic() - start
+
+    report = summarize(recorder.samples, recorder.errors, elapsed)
+    baseline = load_report(args.baseline) if args.baseline else None
+    print_report(report, baseline)
+    if args.save_baseline:
+        save_report(args.save_baseline, report)
+    if baseline:
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for endpoint in regressions:
+            print(f"REGRESSION: {endpoint} p99 above baseline by more than {args.tolerance:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
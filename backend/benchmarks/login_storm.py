@@ -0,0 +1,78 @@
+"""Measure /courses latency while a burst of logins hits /token.
+
+Usage: python benchmarks/login_storm.py --base-url http://localhost:5000 \
+           --email student@example.com --password secret --logins 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from common import percentile
+
+
+async def login(client, email, password):
+    response = await client.post("/token", data={"username": email, "password": password})
+    return response.status_code
+
+
+async def poll_courses(client, token, stop, samples):
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/courses", headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+async def measure(client, token, seconds, storm=None):
+    samples = []
+    stop = asyncio.Event()
+    poller = asyncio.create_task(poll_courses(client, token, stop, samples))
+    if storm is not None:
+        await storm
+    else:
+        await asyncio.sleep(seconds)
+    stop.set()
+    await poller
+    return samples
+
+
+def report(label, samples):
+    print(
+        f"{label:>10}: n={len(samples)} "
+        f"p50={statistics.median(samples):.1f}ms "
+        f"p99={percentile(samples, 99):.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        response = await client.post(
+            "/token", data={"username": args.email, "password": args.password}
+        )
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        report("idle", await measure(client, token, args.baseline_seconds))
+
+        storm = asyncio.gather(
+            *(login(client, args.email, args.password) for _ in range(args.logins))
+        )
+        samples = await measure(client, token, 0, storm=storm)
+        codes = storm.result()
+        report("storm", samples)
+        print(f"logins: {codes.count(200)} ok, {codes.count(503)} shed, {len(codes)} total")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
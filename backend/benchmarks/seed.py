@@ -0,0 +1,231 @@
+"""Seed a LearnLive database with synthetic data at a configurable scale.
+
+Every seeded user's password is BENCH_PASSWORD. Emails are
+student<N>@bench.learnlive and teacher<N>@bench.learnlive.
+
+Usage: python benchmarks/seed.py --students 100000 --courses 5000 --drop
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_PASSWORD = "benchmark"
+BATCH_SIZE = 5000
+GRADES = [str(grade) for grade in range(1, 13)]
+COLLECTIONS = ["users", "courses", "enrollments", "sessions", "course_materials"]
+
+
+def student_email(index):
+    return f"student{index}@bench.learnlive"
+
+
+def teacher_email(index):
+    return f"teacher{index}@bench.learnlive"
+
+
+async def insert_batched(collection, documents):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == BATCH_SIZE:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def seed(
+    db,
+    password_hash,
+    students=1000,
+    teachers=50,
+    courses=200,
+    enrollments_per_student=3,
+    sessions_per_course=8,
+    materials_per_course=5,
+    rng_seed=42,
+):
+    """Insert synthetic users, courses, enrollments, sessions and materials."""
+    rng = random.Random(rng_seed)
+    now = datetime.utcnow()
+    timings = {}
+
+    start = time.perf_counter()
+    teacher_ids = [ObjectId() for _ in range(teachers)]
+    await insert_batched(db.users, (
+        {
+            "_id": teacher_ids[i],
+            "email": teacher_email(i),
+            "name": f"Teacher {i}",
+            "role": "teacher",
+            "class_level": None,
+            "password": password_hash,
+            "created_at": now,
+        }
+        for i in range(teachers)
+    ))
+    student_ids = [ObjectId() for _ in range(students)]
+    await insert_batched(db.users, (
+        {
+            "_id": student_ids[i],
+            "email": student_email(i),
+            "name": f"Student {i}",
+            "role": "student",
+            "class_level": rng.choice(GRADES),
+            "password": password_hash,
+            "created_at": now,
+        }
+        for i in range(students)
+    ))
+    timings["users"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    course_docs = []
+    for i in range(courses):
+        teacher = rng.randrange(teachers)
+        course_docs.append({
+            "_id": ObjectId(),
+            "title": f"Course {i}",
+            "description": f"Synthetic course {i} for benchmarking",
+            "grade": rng.choice(GRADES),
+            "price": float(rng.choice([0, 199, 499, 999, 1999])),
+            "teacher_id": str(teacher_ids[teacher]),
+            "teacher_name": f"Teacher {teacher}",
+            "created_at": now - timedelta(days=rng.randrange(365)),
+            "student_count": 0,
+            "material_count": materials_per_course,
+            "next_session_at": None,
+        })
+
+    # Draw enrollments and session times up front so the courses are
+    # inserted with the same denormalized counters the API maintains
+    picks = [
+        (student_id, rng.sample(course_docs, min(enrollments_per_student, len(course_docs))))
+        for student_id in student_ids
+    ]
+    for _, picked in picks:
+        for course in picked:
+            course["student_count"] += 1
+    session_starts = {}
+    for course in course_docs:
+        session_starts[course["_id"]] = [
+            (now + timedelta(days=n * 7, hours=rng.randrange(8, 18))).replace(
+                minute=0, second=0, microsecond=0
+            )
+            for n in range(sessions_per_course)
+        ]
+        course["next_session_at"] = min(session_starts[course["_id"]], default=None)
+    await insert_batched(db.courses, course_docs)
+    timings["courses"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    def enrollments():
+        for student_id, picked in picks:
+            for course in picked:
+                yield {
+                    "user_id": str(student_id),
+                    "course_id": str(course["_id"]),
+                    "source": "seed",
+                    "created_at": now,
+                }
+
+    await insert_batched(db.enrollments, enrollments())
+    timings["enrollments"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    def sessions():
+        for course in course_docs:
+            for n, starts_at in enumerate(session_starts[course["_id"]]):
+                yield {
+                    "title": f"{course['title']} session {n}",
+                    "description": "Synthetic session",
+                    "module_id": None,
+                    "course_id": str(course["_id"]),
+                    "course": course["title"],
+                    "date": starts_at.strftime("%Y-%m-%d"),
+                    "time": starts_at.strftime("%H:%M:%S"),
+                    "timezone": None,
+                    "duration": 60,
+                    "teacher": course["teacher_name"],
+                    "teacher_id": course["teacher_id"],
+                    "attendees": [],
+                    "meeting_link": f"https://meet.jit.si/learnlive-session-{ObjectId()}",
+                    "starts_at": starts_at,
+                    "ends_at": starts_at + timedelta(minutes=60),
+                }
+
+    await insert_batched(db.sessions, sessions())
+    timings["sessions"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    def materials():
+        for course in course_docs:
+            for n in range(materials_per_course):
+                yield {
+                    "title": f"Notes {n}",
+                    "description": "Synthetic material",
+                    "type": "note",
+                    "content": "Lorem ipsum " * 50,
+                    "external_url": None,
+                    "file_url": None,
+                    "file_name": None,
+                    "file_size": None,
+                    "file_hash": None,
+                    "course_id": str(course["_id"]),
+                    "created_at": now - timedelta(days=n),
+                    "created_by": course["teacher_id"],
+                }
+
+    await insert_batched(db.course_materials, materials())
+    timings["course_materials"] = time.perf_counter() - start
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--teachers", type=int, default=50)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--enrollments-per-student", type=int, default=3)
+    parser.add_argument("--sessions-per-course", type=int, default=8)
+    parser.add_argument("--materials-per-course", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="drop existing collections first")
+    args = parser.parse_args()
+
+    from main import close_mongo, connect_mongo, ensure_indexes, get_password_hash
+
+    db = connect_mongo()
+    if args.drop:
+        for name in COLLECTIONS:
+            await db[name].drop()
+    await ensure_indexes()
+    timings = await seed(
+        db,
+        get_password_hash(BENCH_PASSWORD),
+        students=args.students,
+        teachers=args.teachers,
+        courses=args.courses,
+        enrollments_per_student=args.enrollments_per_student,
+        sessions_per_course=args.sessions_per_course,
+        materials_per_course=args.materials_per_course,
+        rng_seed=args.seed,
+    )
+    close_mongo()
+    for name, seconds in timings.items():
+        print(f"{name:>17}: {seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
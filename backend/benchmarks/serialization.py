@@ -0,0 +1,65 @@
+"""Compare per-item cost of FastAPI's response_model path with list_response.
+
+Usage: python benchmarks/serialization.py --items 5000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import Course, CourseList, list_response  # noqa: E402
+
+
+def make_courses(count):
+    courses = []
+    for i in range(count):
+        _id = ObjectId()
+        courses.append({
+            "_id": _id,
+            "id": str(_id),
+            "title": f"Course {i}",
+            "description": "An example course description " * 4,
+            "grade": str(i % 12 + 1),
+            "price": 499.0,
+            "teacher_id": str(ObjectId()),
+            "teacher_name": "Teacher",
+            "modules": [],
+            "student_count": i % 300,
+            "created_at": datetime.utcnow(),
+        })
+    return courses
+
+
+def response_model_path(courses):
+    # What FastAPI does per item for response_model=List[Course]
+    validated = [Course.model_validate(course) for course in courses]
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def list_response_path(courses):
+    return list_response(CourseList, courses).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    courses = make_courses(args.items)
+    assert json.loads(response_model_path(courses)) == json.loads(list_response_path(courses))
+
+    for name, func in (("response_model", response_model_path), ("list_response", list_response_path)):
+        best = min(timeit.repeat(lambda: func(courses), number=1, repeat=args.repeat))
+        print(f"{name:>15}: {best * 1e6 / args.items:.2f} us/item ({best * 1000:.1f} ms total)")
+
+
+if __name__ == "__main__":
+    main()
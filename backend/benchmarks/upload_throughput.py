@@ -0,0 +1,84 @@
+"""Measure material upload throughput and concurrent request latency.
+
+Creates a test file of --size-mb (reused if it already exists), uploads it
+to a course while polling GET / and reports MB/s plus the poller's p50/p99.
+
+Usage: python benchmarks/upload_throughput.py --base-url http://localhost:5000 \
+           --email teacher@example.com --password secret --course-id <id> --size-mb 2000
+
+Sizes above the server's MAX_UPLOAD_BYTES (2 GiB by default) are rejected
+with 413 before any data is sent; raise it on the server to test larger files.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from common import percentile
+
+
+def ensure_test_file(path, size_mb):
+    size = size_mb * 1024 * 1024
+    if os.path.exists(path) and os.path.getsize(path) == size:
+        return
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+async def poll_root(client, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/")
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.05)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--course-id", required=True)
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--path", default="upload-benchmark.bin")
+    args = parser.parse_args()
+
+    ensure_test_file(args.path, args.size_mb)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+        response = await client.post(
+            "/token", data={"username": args.email, "password": args.password}
+        )
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        samples = []
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_root(client, stop, samples))
+        start = time.perf_counter()
+        with open(args.path, "rb") as f:
+            response = await client.post(
+                f"/courses/{args.course_id}/materials",
+                headers=headers,
+                data={"title": "Upload benchmark", "description": "benchmark", "type": "video"},
+                files={"file": (os.path.basename(args.path), f, "application/octet-stream")},
+            )
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await poller
+
+    print(f"upload: status={response.status_code} {args.size_mb / elapsed:.1f} MB/s ({elapsed:.1f}s)")
+    if samples:
+        print(
+            f"GET / during upload: n={len(samples)} "
+            f"p50={statistics.median(samples):.1f}ms p99={percentile(samples, 99):.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,22 @@
+"""Fail if any route's query plan falls back to a collection scan.
+
+Usage: python check_query_plans.py
+"""
+import asyncio
+import sys
+
+from main import close_mongo, connect_mongo, ensure_indexes, find_collscans
+
+
+async def main():
+    connect_mongo()
+    await ensure_indexes()
+    offenders = await find_collscans()
+    close_mongo()
+    for name in offenders:
+        print(f"COLLSCAN: {name}")
+    return 1 if offenders else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,21 +1,51 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Body, UploadFile, File, Form, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Body, UploadFile, File, Form, Request, Query, Response, Header
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Optional, Dict, Any, get_args
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from motor.motor_asyncio import AsyncIOMotorClient
-from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+from bson import ObjectId, json_util
+import bson
 import os
 import socket
 from dotenv import load_dotenv
-import shutil
-import uuid
+import hashlib
+import hmac
+import math
+from urllib.parse import urlencode
+import tempfile
 from pathlib import Path
-from fastapi.staticfiles import StaticFiles
 import logging
+import mimetypes
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, defaultdict
+import time
+import threading
+import json
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,27 +54,443 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# MongoDB connection
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGODB_URL)
-db = client.learnlive
+@dataclass(frozen=True)
+class Settings:
+    mongodb_url: str = "mongodb://localhost:27017"
+    mongodb_database: str = "learnlive"
+    mongodb_max_pool_size: int = 100
+    mongodb_min_pool_size: int = 0
+    mongodb_max_idle_time_ms: Optional[int] = None
+    mongodb_wait_queue_timeout_ms: int = 5000
+    mongodb_server_selection_timeout_ms: int = 5000
+    mongodb_connect_timeout_ms: int = 10000
+    mongodb_compressors: str = ""  # e.g. "zstd,snappy"
+    catalog_read_preference: str = "primary"  # e.g. "secondaryPreferred"
+    host: str = "0.0.0.0"
+    port: int = 5000
+    workers: int = 1
+    graceful_shutdown_seconds: int = 30
+    secret_key: str = "your-very-secret-key-123"
+    bcrypt_rounds: int = 12
+    hash_workers: int = 4
+    hash_queue_limit: int = 64
+    max_upload_bytes: int = 2 * 1024 ** 3
+    download_url_ttl_seconds: int = 3600
+    user_cache_ttl_seconds: float = 30
+    user_cache_max_entries: int = 10000
+    enrollment_cache_ttl_seconds: float = 300
+    response_cache_ttl_seconds: float = 60
+    response_cache_max_entries: int = 2000
+    response_cache_url: Optional[str] = None  # redis://... to share caches across workers
+    analytics_cache_ttl_seconds: float = 60
+    course_counter_reconcile_seconds: float = 300
+    attendance_heartbeat_seconds: int = 30
+    attendance_flush_seconds: float = 5
+    attendance_flush_max_pending: int = 1000
+    attendance_grace_minutes: int = 15
+    session_timezone: str = "UTC"
+    event_queue_size: int = 100
+
+    @classmethod
+    def from_env(cls):
+        values = {}
+        for name, field in cls.__dataclass_fields__.items():
+            raw = os.getenv(name.upper())
+            if raw is None:
+                continue
+            # Optional[X] parses as X
+            field_type = next((arg for arg in get_args(field.type) if arg is not type(None)), field.type)
+            values[name] = raw if field_type is str else field_type(raw)
+        return cls(**values)
+
+settings = Settings.from_env()
+
+# Metrics (Prometheus text format, served on /metrics)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metric:
+    """Labelled counter/gauge; safe to update from pymongo's threads."""
+
+    def __init__(self, name: str, help_text: str, metric_type: str, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self.label_names = label_names
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self.lock:
+            self.values[labels] += amount
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def _labels(self, labels, extra=()):
+        pairs = list(zip(self.label_names, labels)) + list(extra)
+        if not pairs:
+            return ""
+        parts = []
+        for name, value in pairs:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+            parts.append(f'{name}="{value}"')
+        return "{" + ",".join(parts) + "}"
+
+    def _samples(self):
+        with self.lock:
+            return [(f"{self.name}{self._labels(labels)}", value) for labels, value in self.values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(f"{name} {value}" for name, value in self._samples())
+        return "\n".join(lines)
+
+class Histogram(Metric):
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, "histogram", label_names)
+        self.buckets = buckets
+        self.counts = {}
+        self.sums = defaultdict(float)
+
+    def observe(self, value: float, *labels):
+        with self.lock:
+            counts = self.counts.setdefault(labels, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self.sums[labels] += value
+
+    def _samples(self):
+        samples = []
+        with self.lock:
+            for labels, counts in self.counts.items():
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket{self._labels(labels, [('le', bound)])}", count))
+                samples.append((f"{self.name}_bucket{self._labels(labels, [('le', '+Inf')])}", counts[-1]))
+                samples.append((f"{self.name}_sum{self._labels(labels)}", self.sums[labels]))
+                samples.append((f"{self.name}_count{self._labels(labels)}", counts[-1]))
+        return samples
+
+http_requests_total = Metric(
+    "http_requests_total", "HTTP requests by route and status.", "counter",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = Metric(
+    "http_requests_in_flight", "HTTP requests currently being served.", "gauge",
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and status.",
+    ("method", "route", "status"),
+)
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency.",
+    ("collection", "operation"),
+)
+mongo_command_failures = Metric(
+    "mongodb_command_failures_total", "Failed MongoDB commands.", "counter",
+    ("collection", "operation"),
+)
+mongo_documents_returned = Metric(
+    "mongodb_documents_returned_total", "Documents returned by MongoDB commands.", "counter",
+    ("collection", "operation"),
+)
+mongo_pool_wait = Histogram(
+    "mongodb_pool_wait_seconds", "Time spent waiting to check out a pooled connection.",
+)
+event_subscribers = Metric(
+    "event_stream_subscribers", "Open /events streams.", "gauge",
+)
+event_subscribers_dropped = Metric(
+    "event_stream_dropped_total", "Event streams closed because the client fell behind.", "counter",
+)
+mongo_pool_checkout_failures = Metric(
+    "mongodb_pool_checkout_failures_total", "Failed connection checkouts by reason.", "counter",
+    ("reason",),
+)
+METRICS = [
+    http_requests_total,
+    http_requests_in_flight,
+    http_request_duration,
+    mongo_command_duration,
+    mongo_command_failures,
+    mongo_documents_returned,
+    mongo_pool_wait,
+    mongo_pool_checkout_failures,
+    event_subscribers,
+    event_subscribers_dropped,
+]
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by collection and operation."""
+
+    def __init__(self):
+        self.pending = {}
+
+    def started(self, event):
+        key = "collection" if event.command_name == "getMore" else event.command_name
+        collection = event.command.get(key)
+        if not isinstance(collection, str):
+            collection = ""
+        self.pending[(event.connection_id, event.request_id)] = (collection, event.command_name)
+
+    def _finish(self, event):
+        return self.pending.pop((event.connection_id, event.request_id), ("", event.command_name))
+
+    def succeeded(self, event):
+        collection, operation = self._finish(event)
+        mongo_command_duration.observe(event.duration_micros / 1e6, collection, operation)
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if cursor:
+            returned = len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+            mongo_documents_returned.inc(collection, operation, amount=returned)
+
+    def failed(self, event):
+        collection, operation = self._finish(event)
+        mongo_command_duration.observe(event.duration_micros / 1e6, collection, operation)
+        mongo_command_failures.inc(collection, operation)
+
+class MetricsMiddleware:
+    """Records request count, in-flight requests and latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"), str(status_code))
+            http_requests_total.inc(*labels)
+            http_request_duration.observe(time.perf_counter() - start, *labels)
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Measures how long operations wait to check a connection out of the pool."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self.local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self.local, "started", None)
+        if started is not None:
+            mongo_pool_wait.observe(time.perf_counter() - started)
+            self.local.started = None
+
+    def connection_check_out_failed(self, event):
+        self.local.started = None
+        mongo_pool_checkout_failures.inc(str(event.reason))
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+# MongoDB connection; built by connect_mongo() from the app lifespan.
+# catalog_db serves read-only catalog queries with CATALOG_READ_PREFERENCE.
+# Loaders that fill the response cache must read from db (the primary):
+# a lagging secondary read right after an invalidation would be cached
+# under the new version and outlive the write.
+client = None
+db = None
+catalog_db = None
+
+def connect_mongo(config: Settings = settings):
+    global client, db, catalog_db
+    options = {
+        "maxPoolSize": config.mongodb_max_pool_size,
+        "minPoolSize": config.mongodb_min_pool_size,
+        "waitQueueTimeoutMS": config.mongodb_wait_queue_timeout_ms,
+        "serverSelectionTimeoutMS": config.mongodb_server_selection_timeout_ms,
+        "connectTimeoutMS": config.mongodb_connect_timeout_ms,
+    }
+    if config.mongodb_max_idle_time_ms is not None:
+        options["maxIdleTimeMS"] = config.mongodb_max_idle_time_ms
+    if config.mongodb_compressors:
+        options["compressors"] = config.mongodb_compressors
+    client = AsyncIOMotorClient(
+        config.mongodb_url,
+        event_listeners=[MongoCommandMetrics(), MongoPoolMetrics()],
+        **options
+    )
+    db = client[config.mongodb_database]
+    read_preference = make_read_preference(
+        read_pref_mode_from_name(config.catalog_read_preference), None
+    )
+    catalog_db = client.get_database(config.mongodb_database, read_preference=read_preference)
+    return db
+
+def close_mongo():
+    if client is not None:
+        client.close()
 
 # File upload settings
 UPLOAD_DIR = "uploads"
 Path(UPLOAD_DIR).mkdir(exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = settings.max_upload_bytes
+# Room for multipart boundaries and the other form fields around a file
+MAX_REQUEST_BYTES = MAX_UPLOAD_BYTES + 1024 * 1024
+
+class BodySizeLimitMiddleware:
+    """Rejects request bodies over max_bytes before they are spooled to disk.
+
+    A declared Content-Length is checked up front; chunked bodies are counted
+    as they arrive and fail with 413 once they pass the limit.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        detail = f"Request body exceeds the {self.max_bytes} byte limit"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = Response(
+                content=json.dumps({"detail": detail}),
+                status_code=413,
+                media_type="application/json"
+            )
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def receive_wrapper():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, receive_wrapper, send)
 
 # JWT settings
-SECRET_KEY = os.getenv("SECRET_KEY", "your-very-secret-key-123")
+SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Signed material download URLs; expiry is rounded up to a bucket so the
+# URL for a file stays stable (and browser-cacheable) within that bucket
+DOWNLOAD_URL_TTL_SECONDS = settings.download_url_ttl_seconds
+DOWNLOAD_URL_BUCKET_SECONDS = 600
+
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt runs on a bounded pool so logins don't block the event loop
+HASH_WORKERS = settings.hash_workers
+HASH_QUEUE_LIMIT = settings.hash_queue_limit
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+hash_slots = asyncio.Semaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+
+# Authenticated-user cache
+USER_CACHE_TTL_SECONDS = settings.user_cache_ttl_seconds
+USER_CACHE_MAX_ENTRIES = settings.user_cache_max_entries
+ENROLLMENT_CACHE_TTL_SECONDS = settings.enrollment_cache_ttl_seconds
+
+# Catalog/material response cache; set RESPONSE_CACHE_URL (redis://...) to share it
+RESPONSE_CACHE_TTL_SECONDS = settings.response_cache_ttl_seconds
+RESPONSE_CACHE_MAX_ENTRIES = settings.response_cache_max_entries
+RESPONSE_CACHE_URL = settings.response_cache_url
+
+# Teacher analytics are computed on demand and cached briefly per teacher and window
+ANALYTICS_CACHE_TTL_SECONDS = settings.analytics_cache_ttl_seconds
+ANALYTICS_WINDOWS = (7, 30, 90)
+
+# Denormalized course counters are repaired by a background reconciler
+COURSE_COUNTER_RECONCILE_SECONDS = settings.course_counter_reconcile_seconds
+
+# Attendance events are coalesced in memory and written in batches
+ATTENDANCE_HEARTBEAT_SECONDS = settings.attendance_heartbeat_seconds
+ATTENDANCE_FLUSH_SECONDS = settings.attendance_flush_seconds
+ATTENDANCE_FLUSH_MAX_PENDING = settings.attendance_flush_max_pending
+# Attendance is accepted from this long before a session starts until this long after it ends
+ATTENDANCE_GRACE_MINUTES = settings.attendance_grace_minutes
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-app = FastAPI(title="LearnLive API")
+def check_shared_caches(config: Settings = settings):
+    """Refuse multi-worker setups whose caches could not stay consistent."""
+    if config.workers > 1 and shared_redis is None:
+        raise RuntimeError(
+            "WORKERS > 1 requires RESPONSE_CACHE_URL (and the redis package): response, user "
+            "and enrollment caches must be invalidated across worker processes"
+        )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_shared_caches()
+    connect_mongo()
+    await ensure_indexes()
+    listener = None
+    if shared_redis is not None:
+        listener = asyncio.create_task(listen_for_broadcasts())
+    flusher = asyncio.create_task(flush_attendance_periodically())
+    reconciler = asyncio.create_task(reconcile_course_counters_periodically())
+    yield
+    if listener is not None:
+        listener.cancel()
+    flusher.cancel()
+    reconciler.cancel()
+    await attendance_buffer.flush()
+    close_mongo()
+
+app = FastAPI(title="LearnLive API", lifespan=lifespan)
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_REQUEST_BYTES)
+app.add_middleware(MetricsMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -53,6 +499,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paged list endpoints return their cursor in a header
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Models
@@ -95,11 +543,37 @@ class Course(CourseBase):
     students: Optional[List[str]] = []
     thumbnail: Optional[str] = None
     modules: Optional[List[str]] = []
+    student_count: Optional[int] = None
+    material_count: Optional[int] = None
+    next_session_at: Optional[datetime] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class FacetCount(BaseModel):
+    value: Optional[str] = None
+    count: int
+
+class PriceBandCount(BaseModel):
+    min: Optional[Any] = None  # band lower bound, or "other" for non-numeric prices
+    count: int
+
+class TeacherFacetCount(BaseModel):
+    teacher_id: Optional[str] = None
+    teacher_name: Optional[str] = None
+    count: int
+
+class CourseSearchFacets(BaseModel):
+    grade: List[FacetCount]
+    price: List[PriceBandCount]
+    teacher: List[TeacherFacetCount]
+
+class CourseSearchResult(BaseModel):
+    results: List[Course]
+    total: int
+    facets: CourseSearchFacets
+
 class SessionBase(BaseModel):
     title: str
     description: str
@@ -111,10 +585,12 @@ class SessionBase(BaseModel):
     teacher: str
 
 class SessionCreate(SessionBase):
-    pass
+    timezone: str  # IANA name of the zone date/time were entered in
 
 class Session(SessionBase):
     id: str
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
     meeting_link: Optional[str] = None
     recording_link: Optional[str] = None
     attendees: Optional[List[str]] = []
@@ -122,6 +598,54 @@ class Session(SessionBase):
     class Config:
         from_attributes = True
 
+class EnrollmentBatchRequest(BaseModel):
+    course_ids: List[str]
+
+class EnrollmentResult(BaseModel):
+    course_id: str
+    status: str  # 'enrolled', 'already_enrolled', 'not_found' or 'invalid_id'
+
+class SessionRecurrence(BaseModel):
+    frequency: str = "weekly"  # 'daily' or 'weekly'
+    count: int  # total occurrences, including the first
+
+class SessionBatchItem(SessionCreate):
+    recurrence: Optional[SessionRecurrence] = None
+
+class SessionBatchRequest(BaseModel):
+    sessions: List[SessionBatchItem]
+
+class BatchItemError(BaseModel):
+    index: int
+    error: str
+
+class SessionBatchResult(BaseModel):
+    created: List[Session]
+    errors: List[BatchItemError]
+
+class AttendanceAck(BaseModel):
+    status: str  # 'joined', 'present' or 'left'
+    heartbeat_seconds: int
+
+class Attendee(BaseModel):
+    user_id: str
+    name: Optional[str] = None
+    role: str
+    first_joined_at: Optional[datetime] = None
+    last_seen_at: Optional[datetime] = None
+    left_at: Optional[datetime] = None
+    joins: int = 0
+    minutes_present: float = 0
+    present: bool = False
+
+class AttendanceSummary(BaseModel):
+    session_id: str
+    attendee_count: int = 0
+    present_count: int = 0
+    average_minutes: float = 0
+    first_joined_at: Optional[datetime] = None
+    attendees: List[Attendee] = []
+
 class PaymentRequest(BaseModel):
     course_id: str
     amount: float
@@ -136,6 +660,40 @@ class PaymentResponse(BaseModel):
     course_id: str
     amount: float
 
+class CourseAnalytics(BaseModel):
+    course_id: str
+    title: str
+    price: Optional[float] = None
+    students: int = 0
+    new_students: int = 0  # enrolled within the window
+    revenue: float = 0
+    window_revenue: float = 0
+    payments: int = 0
+    window_payments: int = 0
+    upcoming_sessions: int = 0
+    window_upcoming_sessions: int = 0  # starting within the next window_days
+    next_session_at: Optional[datetime] = None
+    materials: int = 0
+    new_materials: int = 0
+
+class AnalyticsTotals(BaseModel):
+    students: int = 0
+    new_students: int = 0
+    revenue: float = 0
+    window_revenue: float = 0
+    payments: int = 0
+    window_payments: int = 0
+    upcoming_sessions: int = 0
+    window_upcoming_sessions: int = 0
+    materials: int = 0
+    new_materials: int = 0
+
+class TeacherAnalytics(BaseModel):
+    window_days: int
+    generated_at: datetime
+    totals: AnalyticsTotals
+    courses: List[CourseAnalytics]
+
 class CourseMaterialBase(BaseModel):
     title: str
     description: str
@@ -146,6 +704,9 @@ class CourseMaterialCreate(CourseMaterialBase):
     file_url: Optional[str] = None
     external_url: Optional[str] = None
 
+class CourseMaterialBatchRequest(BaseModel):
+    materials: List[CourseMaterialCreate]
+
 class CourseMaterial(CourseMaterialBase):
     id: str
     course_id: str
@@ -160,6 +721,486 @@ class CourseMaterial(CourseMaterialBase):
     class Config:
         from_attributes = True
 
+class CourseMaterialBatchResult(BaseModel):
+    created: List[CourseMaterial]
+    errors: List[BatchItemError]
+
+# In-process caching
+class TTLCache:
+    """Small LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def peek(self, key):
+        """Return a live entry without touching LRU order or counters."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+user_cache = TTLCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+# user_id -> set of enrolled course ids and titles (legacy sessions match by title)
+enrolled_course_cache = TTLCache(ENROLLMENT_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+# (teacher_id, window_days) -> analytics document
+analytics_cache = TTLCache(ANALYTICS_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+
+# Batch endpoints
+MAX_BATCH_ITEMS = 500  # sessions (after recurrence expansion) and materials per request
+MAX_ENROLLMENT_BATCH = 50
+MATERIAL_BATCH_TYPES = {"note", "text", "link"}  # types that need no file upload
+RECURRENCE_STEPS = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+
+# Catalog pagination
+COURSES_PAGE_SIZE = 50
+COURSES_MAX_PAGE_SIZE = 200
+
+# Catalog search
+PRICE_BAND_BOUNDARIES = [0, 1, 500, 1000, 2000]  # last band is 2000 and up
+TEACHER_FACET_LIMIT = 20
+
+# Session scheduling
+SESSION_TIMEZONE = settings.session_timezone
+MAX_SESSION_MINUTES = 24 * 60
+SESSIONS_MAX_PAGE_SIZE = 200
+
+class LocalResponseCache:
+    """In-process response cache; invalidation bumps a per-namespace version."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.entries = TTLCache(ttl, max_entries)
+        self.versions = {}
+
+    async def version(self, namespace):
+        return self.versions.get(namespace, 0)
+
+    async def bump(self, namespace):
+        self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+    async def get(self, key):
+        entry = self.entries.get(key)
+        return entry[0] if entry else None
+
+    async def set(self, key, value):
+        self.entries.set(key, (value, len(bson.encode({"value": value}))))
+
+    async def stats(self):
+        stats = self.entries.stats()
+        stats["backend"] = "local"
+        stats["bytes"] = sum(entry[1][1] for entry in self.entries._data.values())
+        return stats
+
+class RedisResponseCache:
+    """Response cache in a Redis-compatible server, shared by all workers."""
+
+    prefix = "learnlive:response:"
+
+    def __init__(self, redis, ttl: float):
+        self.redis = redis
+        self.ttl = max(1, int(ttl))
+        self.hits = 0
+        self.misses = 0
+
+    async def version(self, namespace):
+        return int(await self.redis.get(f"{self.prefix}version:{namespace}") or 0)
+
+    async def bump(self, namespace):
+        await self.redis.incr(f"{self.prefix}version:{namespace}")
+
+    async def get(self, key):
+        raw = await self.redis.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json_util.loads(raw)
+
+    async def set(self, key, value):
+        await self.redis.set(self.prefix + key, json_util.dumps(value), ex=self.ttl)
+
+    async def stats(self):
+        lookups = self.hits + self.misses
+        memory = await self.redis.info("memory")
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": memory.get("used_memory"),
+        }
+
+# Redis shared by all workers: response cache storage and cache invalidation fan-out
+shared_redis = None
+if RESPONSE_CACHE_URL:
+    if aioredis is not None:
+        shared_redis = aioredis.from_url(RESPONSE_CACHE_URL)
+    else:
+        logger.warning("RESPONSE_CACHE_URL is set but redis is not installed; using local caches only")
+
+if shared_redis is not None:
+    response_cache = RedisResponseCache(shared_redis, RESPONSE_CACHE_TTL_SECONDS)
+else:
+    response_cache = LocalResponseCache(RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES)
+
+# Per-process caches other workers must drop entries from when we write
+INVALIDATION_CHANNEL = "learnlive:invalidate"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+LOCAL_CACHES = {
+    "user": user_cache,
+    "enrolled_courses": enrolled_course_cache,
+}
+
+async def broadcast_invalidation(cache_name: str, key: str):
+    """Tell other workers to drop key from their copy of a per-process cache."""
+    if shared_redis is None:
+        return
+    message = json.dumps({"origin": WORKER_ID, "cache": cache_name, "key": key})
+    try:
+        await shared_redis.publish(INVALIDATION_CHANNEL, message)
+    except Exception as e:
+        # The write already committed; other workers' entries expire by TTL
+        logger.warning(f"Could not broadcast {cache_name} invalidation: {str(e)}")
+
+BROADCAST_RETRY_MAX_SECONDS = 30
+
+def apply_broadcast(message: dict):
+    data = json.loads(message["data"])
+    if data["origin"] == WORKER_ID:
+        return
+    channel = message["channel"]
+    if isinstance(channel, bytes):
+        channel = channel.decode()
+    if channel == EVENTS_CHANNEL:
+        event_hub.dispatch(data["event"])
+    elif data["cache"] in LOCAL_CACHES:
+        LOCAL_CACHES[data["cache"]].invalidate(data["key"])
+
+async def listen_for_broadcasts():
+    """Apply cache invalidations and relay events published by other workers.
+
+    Runs for the life of the worker: bad messages are skipped, and a lost
+    Redis connection is retried with backoff. Invalidations published while
+    unsubscribed are lost, so the local caches are cleared on every
+    (re)subscribe.
+    """
+    delay = 1
+    while True:
+        pubsub = shared_redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL, EVENTS_CHANNEL)
+            for cache in LOCAL_CACHES.values():
+                cache.clear()
+            delay = 1
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    apply_broadcast(message)
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"Ignoring malformed broadcast: {str(e)}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast listener lost Redis, resubscribing in {delay}s: {str(e)}")
+        finally:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, BROADCAST_RETRY_MAX_SECONDS)
+
+async def invalidate_cached_user(email: str):
+    user_cache.invalidate(email)
+    await broadcast_invalidation("user", email)
+
+# Push notifications: events fan out to subscribers by topic. Topics are
+# "user:<id>", "teacher:<id>" and "course:<id or title>" (legacy sessions
+# name their course by title, like the enrolled-course set does).
+EVENTS_CHANNEL = "learnlive:events"
+EVENT_QUEUE_SIZE = settings.event_queue_size
+EVENT_HEARTBEAT_SECONDS = 15
+
+class EventSubscriber:
+    def __init__(self, topics: set):
+        self.topics = set(topics)
+        self.queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.dropped = False
+
+class EventHub:
+    """In-process pub/sub; a subscriber that falls behind is dropped, not buffered."""
+
+    def __init__(self):
+        self.by_topic = defaultdict(set)
+
+    def subscribe(self, subscriber: EventSubscriber):
+        for topic in subscriber.topics:
+            self.by_topic[topic].add(subscriber)
+        event_subscribers.inc()
+
+    def unsubscribe(self, subscriber: EventSubscriber):
+        for topic in subscriber.topics:
+            subscribers = self.by_topic.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.by_topic[topic]
+        event_subscribers.dec()
+
+    def add_topic(self, subscriber: EventSubscriber, topic: str):
+        subscriber.topics.add(topic)
+        self.by_topic[topic].add(subscriber)
+
+    def dispatch(self, event: dict):
+        subscribers = set()
+        for topic in event["topics"]:
+            subscribers |= self.by_topic.get(topic, set())
+        for subscriber in subscribers:
+            # follow maps a subscriber topic to topics its streams should add,
+            # e.g. the enrolling student's streams start following the course
+            for owner, topics in event["follow"].items():
+                if owner in subscriber.topics:
+                    for topic in topics:
+                        self.add_topic(subscriber, topic)
+            if subscriber.dropped:
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                event_subscribers_dropped.inc()
+
+event_hub = EventHub()
+
+async def publish_event(
+    event_type: str, topics: List[str], data: dict, follow: Optional[Dict[str, List[str]]] = None
+):
+    event = {
+        "type": event_type,
+        "topics": [topic for topic in topics if topic],
+        # Same wire format as the REST responses: ISO datetimes, string ids
+        "data": jsonable_encoder(data, custom_encoder={ObjectId: str}),
+        "follow": follow or {},
+    }
+    event_hub.dispatch(event)
+    if shared_redis is not None:
+        try:
+            await shared_redis.publish(EVENTS_CHANNEL, json.dumps({"origin": WORKER_ID, "event": event}))
+        except Exception as e:
+            # Notifications are best-effort; never fail the write that triggered them
+            logger.warning(f"Could not relay {event_type} event: {str(e)}")
+
+def session_topics(session: dict):
+    topics = [f"teacher:{session['teacher_id']}"]
+    for key in ("course_id", "course"):
+        if session.get(key):
+            topics.append(f"course:{session[key]}")
+    return topics
+
+def session_event_data(session: dict):
+    return {
+        "id": str(session["_id"]),
+        "title": session["title"],
+        "course": session.get("course"),
+        "course_id": session.get("course_id"),
+        "starts_at": session.get("starts_at"),
+    }
+
+async def cached_response(namespaces: List[str], key: str, loader):
+    """Return loader()'s result, cached until TTL or any namespace is invalidated."""
+    versions = [str(await response_cache.version(namespace)) for namespace in namespaces]
+    versioned_key = f"{key}@{'.'.join(versions)}"
+    value = await response_cache.get(versioned_key)
+    if value is None:
+        value = await loader()
+        if value is not None:
+            await response_cache.set(versioned_key, value)
+    return value
+
+async def invalidate_responses(*namespaces: str):
+    for namespace in namespaces:
+        await response_cache.bump(namespace)
+
+# Indexes for every query shape the API issues
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "courses": [
+        IndexModel([("grade", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("teacher_id", ASCENDING), ("title", ASCENDING)]),
+        IndexModel(
+            [("title", TEXT), ("description", TEXT), ("teacher_name", TEXT)],
+            weights={"title": 10, "teacher_name": 5, "description": 1},
+            name="course_text",
+        ),
+    ],
+    "enrollments": [
+        IndexModel([("user_id", ASCENDING), ("course_id", ASCENDING)], unique=True),
+        IndexModel([("course_id", ASCENDING)]),
+    ],
+    "course_materials": [
+        IndexModel([("course_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "payments": [
+        IndexModel([("course_id", ASCENDING), ("transaction_date", ASCENDING)]),
+        IndexModel([("payment_id", ASCENDING)], unique=True),
+        # Only payments whose enrollment has not been written yet
+        IndexModel(
+            [("transaction_date", ASCENDING)],
+            partialFilterExpression={"enrolled": False},
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$type": "string"}},
+        ),
+    ],
+    "attendance": [
+        IndexModel([("session_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+    ],
+    "sessions": [
+        IndexModel([("teacher_id", ASCENDING), ("starts_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("course_id", ASCENDING), ("starts_at", ASCENDING), ("_id", ASCENDING)]),
+        # Older sessions reference their course by title
+        IndexModel([("course", ASCENDING), ("starts_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("starts_at", ASCENDING)]),
+    ],
+}
+
+async def ensure_indexes():
+    start = time.perf_counter()
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Ensured MongoDB indexes in {elapsed:.2f}s")
+
+# Representative (collection, filter, sort) for each route's queries
+QUERY_SHAPES = {
+    "get_user": ("users", {"email": "user@example.com"}, None),
+    "get_courses": ("courses", {"grade": "10"}, [("_id", ASCENDING)]),
+    "get_enrolled_courses": ("enrollments", {"user_id": "user-id"}, None),
+    "is_enrolled": ("enrollments", {"user_id": "user-id", "course_id": "course-id"}, None),
+    "search_courses": ("courses", {"$text": {"$search": "algebra"}}, None),
+    "event_topics (teacher courses)": ("courses", {"teacher_id": "user-id"}, None),
+    "advance_next_session": ("courses", {"teacher_id": "user-id", "title": "Course title"}, None),
+    "teacher_analytics (revenue)": ("payments", {"course_id": {"$in": ["course-id"]}}, None),
+    "get_session_attendance": ("attendance", {"session_id": "session-id"}, None),
+    "repair_payments": (
+        "payments", {"enrolled": False, "transaction_date": {"$lt": datetime(2000, 1, 1)}}, None
+    ),
+    "process_payment (replay)": (
+        "payments", {"user_id": "user-id", "idempotency_key": "key"}, None
+    ),
+    "reconcile_course_counters (next sessions)": (
+        "sessions", {"starts_at": {"$gt": datetime(2000, 1, 1)}}, None
+    ),
+    "get_course_materials": (
+        "course_materials", {"course_id": "course-id"}, [("created_at", DESCENDING)]
+    ),
+    "get_upcoming_sessions (student)": (
+        "sessions",
+        {
+            "starts_at": {"$gte": datetime(2000, 1, 1)},
+            "ends_at": {"$gt": datetime(2000, 1, 2)},
+            "$or": [
+                {"course_id": {"$in": ["course-id"]}},
+                {"course": {"$in": ["Course title"]}},
+            ],
+        },
+        [("starts_at", ASCENDING), ("_id", ASCENDING)],
+    ),
+    "get_upcoming_sessions (teacher)": (
+        "sessions",
+        {
+            "starts_at": {"$gte": datetime(2000, 1, 1)},
+            "ends_at": {"$gt": datetime(2000, 1, 2)},
+            "teacher_id": "user-id",
+        },
+        [("starts_at", ASCENDING), ("_id", ASCENDING)],
+    ),
+}
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+async def find_collscans():
+    """Return the names of query shapes whose winning plan is a COLLSCAN."""
+    offenders = []
+    for name, (collection, query, sort) in QUERY_SHAPES.items():
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            offenders.append(name)
+    return offenders
+
+# Fast list responses: validate a whole list once and encode it in one pass
+CourseList = TypeAdapter(List[Course])
+SessionList = TypeAdapter(List[Session])
+CourseMaterialList = TypeAdapter(List[CourseMaterial])
+
+def _encode_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def list_response(adapter: TypeAdapter, items: list, headers: Optional[dict] = None):
+    items = adapter.validate_python(items)
+    if orjson is not None:
+        body = orjson.dumps(adapter.dump_python(items), default=_encode_default)
+    else:
+        body = adapter.dump_json(items)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # Helper functions
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -167,6 +1208,24 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def run_hash_job(func, *args):
+    if hash_slots.locked():
+        raise HTTPException(
+            status_code=503,
+            detail="Too many login requests, please try again",
+            headers={"Retry-After": "1"},
+        )
+    async with hash_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hash_executor, func, *args)
+
+async def verify_password_async(plain_password, hashed_password):
+    # Returns (valid, new_hash); new_hash is set when BCRYPT_ROUNDS changed
+    return await run_hash_job(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await run_hash_job(get_password_hash, password)
+
 async def get_user(email: str):
     user = await db.users.find_one({"email": email})
     if user:
@@ -174,14 +1233,390 @@ async def get_user(email: str):
         return user
     return None
 
+async def get_cached_user(email: str):
+    user = user_cache.get(email)
+    if user is None:
+        user = await get_user(email)
+        if user is None:
+            return None
+        user_cache.set(email, user)
+    # Routes mutate current_user, so never hand out the cached dict itself
+    return dict(user)
+
+async def enroll_user(
+    user_id: str,
+    course_id: str,
+    course_title: Optional[str] = None,
+    teacher_id: Optional[str] = None,
+    source: str = "enroll"
+):
+    """Atomically enroll a user; returns True if they were not enrolled before."""
+    result = await db.enrollments.update_one(
+        {"user_id": user_id, "course_id": course_id},
+        {"$setOnInsert": {"source": source, "created_at": datetime.utcnow()}},
+        upsert=True
+    )
+    newly_enrolled = result.upserted_id is not None
+    await record_enrollments(
+        user_id, {course_id: course_title}, {course_id} if newly_enrolled else set(), {course_id: teacher_id}
+    )
+    return newly_enrolled
+
+async def enroll_user_in_courses(
+    user_id: str, courses: Dict[str, Optional[str]], teachers: Dict[str, str], source: str = "enroll"
+):
+    """Enroll a user in several courses with one bulk upsert; returns the newly enrolled ids."""
+    course_ids = list(courses)
+    now = datetime.utcnow()
+    result = await db.enrollments.bulk_write([
+        UpdateOne(
+            {"user_id": user_id, "course_id": course_id},
+            {"$setOnInsert": {"source": source, "created_at": now}},
+            upsert=True
+        )
+        for course_id in course_ids
+    ], ordered=False)
+    newly_enrolled = {course_ids[index] for index in result.upserted_ids}
+    await record_enrollments(user_id, courses, newly_enrolled, teachers)
+    return newly_enrolled
+
+async def record_enrollments(
+    user_id: str, courses: Dict[str, Optional[str]], newly_enrolled: set, teachers: Dict[str, Optional[str]]
+):
+    """Keep caches, counters and subscribers in step with enrollments that were just written.
+
+    courses maps course id to title and teachers maps course id to teacher id.
+    """
+    enrolled_courses = enrolled_course_cache.peek(user_id)
+    if enrolled_courses is not None:
+        for course_id, course_title in courses.items():
+            enrolled_courses.add(course_id)
+            if course_title:
+                enrolled_courses.add(course_title)
+    if not newly_enrolled:
+        return
+    await broadcast_invalidation("enrolled_courses", user_id)
+    await db.courses.update_many(
+        {"_id": {"$in": [ObjectId(course_id) for course_id in newly_enrolled]}},
+        {"$inc": {"student_count": 1}}
+    )
+    await invalidate_responses("courses", *(f"course:{course_id}" for course_id in newly_enrolled))
+    for course_id in newly_enrolled:
+        follow = [f"course:{course_id}"]
+        if courses.get(course_id):
+            follow.append(f"course:{courses[course_id]}")
+        # Only the student and the course's teacher learn who enrolled
+        teacher_id = teachers.get(course_id)
+        await publish_event(
+            "enrollment",
+            [f"user:{user_id}", f"teacher:{teacher_id}" if teacher_id else None],
+            {"user_id": user_id, "course_id": course_id},
+            follow={f"user:{user_id}": follow},
+        )
+
+# Denormalized course counters: student_count, material_count and
+# next_session_at are kept on the course document by the write paths and
+# repaired by reconcile_course_counters().
+async def add_course_materials(course_id: str, count: int):
+    await db.courses.update_one({"_id": ObjectId(course_id)}, {"$inc": {"material_count": count}})
+    await invalidate_responses("courses", f"course:{course_id}")
+
+async def advance_next_session(teacher_id: str, course_title: Optional[str], starts_at: datetime):
+    """Move the course's next_session_at to starts_at if that is sooner."""
+    if not course_title or starts_at <= datetime.utcnow():
+        return
+    keep_current = {"$and": [
+        {"$gt": ["$next_session_at", "$$NOW"]},
+        {"$lt": ["$next_session_at", starts_at]},
+    ]}
+    course = await db.courses.find_one_and_update(
+        # Sessions name their course by title
+        {"teacher_id": teacher_id, "title": course_title},
+        [{"$set": {"next_session_at": {"$cond": [keep_current, "$next_session_at", starts_at]}}}],
+        projection={"_id": 1}
+    )
+    if course:
+        await invalidate_responses("courses", f"course:{course['_id']}")
+
+async def reconcile_course_counters():
+    """Recompute every course's counters and repair the ones that drifted.
+
+    Course documents are read before the counts, and each repair only applies
+    if the counters still hold the values that were read. A concurrent $inc
+    therefore wins, and any drift it leaves is fixed on the next pass.
+    """
+    courses = await db.courses.find(
+        {}, {"title": 1, "teacher_id": 1, "student_count": 1, "material_count": 1, "next_session_at": 1}
+    ).to_list(length=None)
+    counts_by_course = [
+        {"$group": {"_id": "$course_id", "count": {"$sum": 1}}},
+    ]
+    students = {row["_id"]: row["count"] async for row in db.enrollments.aggregate(counts_by_course)}
+    materials = {row["_id"]: row["count"] async for row in db.course_materials.aggregate(counts_by_course)}
+    next_sessions = {
+        (row["_id"]["teacher_id"], row["_id"]["course"]): row["next_session_at"]
+        async for row in db.sessions.aggregate([
+            {"$match": {"starts_at": {"$gt": datetime.utcnow()}}},
+            {"$group": {
+                "_id": {"teacher_id": "$teacher_id", "course": "$course"},
+                "next_session_at": {"$min": "$starts_at"},
+            }},
+        ])
+    }
+    
+    operations = []
+    repaired_ids = []
+    for course in courses:
+        course_id = str(course["_id"])
+        expected = {
+            "student_count": students.get(course_id, 0),
+            "material_count": materials.get(course_id, 0),
+            "next_session_at": next_sessions.get((course.get("teacher_id"), course.get("title"))),
+        }
+        observed = {field: course.get(field) for field in expected}
+        if observed != expected:
+            operations.append(UpdateOne({"_id": course["_id"], **observed}, {"$set": expected}))
+            repaired_ids.append(course_id)
+    
+    repaired = 0
+    if operations:
+        result = await db.courses.bulk_write(operations, ordered=False)
+        repaired = result.modified_count
+        await invalidate_responses("courses", *(f"course:{course_id}" for course_id in repaired_ids))
+    return repaired
+
+async def acquire_lease(name: str, seconds: float):
+    """Take or renew a lease shared by every worker; True if this worker holds it."""
+    now = datetime.utcnow()
+    try:
+        await db.leases.update_one(
+            {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"owner": WORKER_ID}]},
+            {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Another worker holds an unexpired lease
+        return False
+    return True
+
+async def reconcile_course_counters_periodically():
+    # Only the lease holder scans; the lease outlives one interval so the
+    # holder keeps it, and another worker takes over if the holder dies
+    while True:
+        try:
+            if await acquire_lease("course_counters", 2 * COURSE_COUNTER_RECONCILE_SECONDS):
+                repaired = await repair_payments()
+                if repaired:
+                    logger.info(f"Completed enrollment for {repaired} interrupted payments")
+                repaired = await reconcile_course_counters()
+                if repaired:
+                    logger.info(f"Repaired counters on {repaired} courses")
+        except Exception as e:
+            logger.error(f"Course counter reconciliation failed: {str(e)}")
+        await asyncio.sleep(COURSE_COUNTER_RECONCILE_SECONDS)
+
+async def load_course(course_id: str):
+    """Cached course document, or None."""
+    async def loader():
+        course = await db.courses.find_one({"_id": ObjectId(course_id)})
+        if course:
+            course["id"] = str(course["_id"])
+        return course
+    return await cached_response([f"course:{course_id}"], f"course:{course_id}", loader)
+
+async def is_enrolled(user_id: str, course_id: str):
+    enrollment = await db.enrollments.find_one(
+        {"user_id": user_id, "course_id": course_id}, {"_id": 1}
+    )
+    return enrollment is not None
+
+async def get_enrolled_course_ids(user_id: str):
+    return [
+        enrollment["course_id"]
+        async for enrollment in db.enrollments.find({"user_id": user_id}, {"course_id": 1})
+    ]
+
+async def get_enrolled_course_keys(user_id: str):
+    """Cached set of the ids and titles of every course the user is enrolled in."""
+    enrolled_courses = enrolled_course_cache.get(user_id)
+    if enrolled_courses is None:
+        course_ids = await get_enrolled_course_ids(user_id)
+        enrolled_courses = set(course_ids)
+        object_ids = [ObjectId(course_id) for course_id in course_ids]
+        async for course in db.courses.find({"_id": {"$in": object_ids}}, {"title": 1}):
+            enrolled_courses.add(course["title"])
+        enrolled_course_cache.set(user_id, enrolled_courses)
+    return enrolled_courses
+
 async def authenticate_user(email: str, password: str):
     user = await get_user(email)
     if not user:
         return False
-    if not verify_password(password, user["password"]):
+    valid, new_hash = await verify_password_async(password, user["password"])
+    if not valid:
         return False
+    if new_hash:
+        await db.users.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+        await invalidate_cached_user(email)
+        user["password"] = new_hash
     return user
 
+def parse_session_start(date: str, time: str, tz_name: Optional[str] = None):
+    """Convert a session's local date/time strings to a naive UTC datetime."""
+    local_start = None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d %I:%M %p"):
+        try:
+            local_start = datetime.strptime(f"{date.strip()} {time.strip()}", fmt)
+            break
+        except ValueError:
+            continue
+    if local_start is None:
+        raise ValueError(f"Unrecognised session date/time: {date} {time}")
+    tz = ZoneInfo(tz_name or SESSION_TIMEZONE)
+    return local_start.replace(tzinfo=tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+def build_session(session: dict, teacher_id: str):
+    """Validate a session payload and return the document to insert."""
+    if not 0 < session["duration"] <= MAX_SESSION_MINUTES:
+        raise ValueError("Session duration must be between 1 and 1440 minutes")
+    try:
+        starts_at = parse_session_start(session["date"], session["time"], session.get("timezone"))
+    except ZoneInfoNotFoundError:
+        raise ValueError(f"Unknown timezone: {session.get('timezone')}")
+    
+    return {
+        **session,
+        "starts_at": starts_at,
+        "ends_at": starts_at + timedelta(minutes=session["duration"]),
+        "teacher_id": teacher_id,
+        "attendees": [],
+        "meeting_link": f"https://meet.jit.si/learnlive-session-{ObjectId()}",
+    }
+
+def encode_session_cursor(session: dict):
+    return f"{session['starts_at'].isoformat()}_{session['_id']}"
+
+def decode_session_cursor(cursor: str):
+    try:
+        starts_at, session_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(starts_at), ObjectId(session_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _sync_file(buffer):
+    buffer.flush()
+    os.fsync(buffer.fileno())
+
+def _sync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+async def save_upload(file: UploadFile, file_ext: str):
+    """Store an upload by content hash; returns (file_name, size, sha256).
+
+    Files are reference counted in db.material_files, so identical uploads
+    share one file on disk. The spooled upload is hashed first and only
+    copied into UPLOAD_DIR when no stored file matches. Each copy gets a
+    unique <sha256>-<nonce>.<ext> name, so release_upload can never unlink a
+    file that a concurrent upload has just written.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit"
+            )
+        # hashlib releases the GIL on large buffers, so run it off the loop
+        await asyncio.to_thread(digest.update, chunk)
+    
+    file_hash = digest.hexdigest()
+    existing = await db.material_files.find_one_and_update(
+        {"_id": file_hash, "size": size},
+        {"$inc": {"refs": 1}}
+    )
+    if existing:
+        return existing["file_name"], size, file_hash
+    
+    await file.seek(0)
+    name = f"{file_hash}-{ObjectId()}"
+    file_name = f"{name}.{file_ext}" if file_ext else name
+    file_path = os.path.join(UPLOAD_DIR, file_name)
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(buffer.write, chunk)
+            await asyncio.to_thread(_sync_file, buffer)
+        os.replace(tmp_path, file_path)
+        await asyncio.to_thread(_sync_dir, UPLOAD_DIR)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    stored = await db.material_files.find_one_and_update(
+        {"_id": file_hash},
+        {
+            "$inc": {"refs": 1},
+            "$setOnInsert": {"file_name": file_name, "size": size, "created_at": datetime.utcnow()}
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    if stored["file_name"] != file_name:
+        # A concurrent identical upload registered its copy first; ours is unreferenced
+        os.remove(file_path)
+    return stored["file_name"], size, file_hash
+
+async def release_upload(file_hash: str):
+    """Drop one reference to a stored file, unlinking it with the last one."""
+    await db.material_files.update_one({"_id": file_hash}, {"$inc": {"refs": -1}})
+    stored = await db.material_files.find_one_and_delete({"_id": file_hash, "refs": {"$lte": 0}})
+    if stored:
+        file_path = os.path.join(UPLOAD_DIR, stored["file_name"])
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def _download_signature(file_name: str, course_id: str, material_id: str, expires: int):
+    message = f"{file_name}|{course_id}|{material_id}|{expires}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def sign_material_url(material: dict):
+    """Swap a material's stored file_url for a short-lived signed download URL."""
+    if not material.get("file_url"):
+        return material
+    file_name = material["file_url"].rsplit("/", 1)[-1]
+    course_id = material["course_id"]
+    material_id = str(material["_id"])
+    bucket = DOWNLOAD_URL_BUCKET_SECONDS
+    expires = math.ceil((time.time() + DOWNLOAD_URL_TTL_SECONDS) / bucket) * bucket
+    query = urlencode({
+        "course": course_id,
+        "material": material_id,
+        "expires": expires,
+        "sig": _download_signature(file_name, course_id, material_id, expires),
+    })
+    material["file_url"] = f"/uploads/{file_name}?{query}"
+    return material
+
+def verify_download_signature(file_name: str, request: Request):
+    params = request.query_params
+    try:
+        expires = int(params["expires"])
+        expected = _download_signature(file_name, params["course"], params["material"], expires)
+        # Compare bytes: compare_digest rejects non-ASCII str with TypeError
+        valid = hmac.compare_digest(expected.encode(), params["sig"].encode())
+    except (KeyError, ValueError):
+        valid = False
+    if not valid or expires < time.time():
+        raise HTTPException(status_code=403, detail="Invalid or expired download link")
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -206,7 +1641,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = await get_user(email=token_data.email)
+    user = await get_cached_user(email=token_data.email)
     if user is None:
         raise credentials_exception
     return user
@@ -233,13 +1668,14 @@ async def create_user(user: UserCreate):
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     user_dict = user.dict()
     user_dict.pop("password")
     user_dict["password"] = hashed_password
     user_dict["created_at"] = datetime.utcnow()
     
     result = await db.users.insert_one(user_dict)
+    await invalidate_cached_user(user.email)
     user_dict["id"] = str(result.inserted_id)
     
     return user_dict
@@ -258,46 +1694,179 @@ async def update_class_level(class_data: dict = Body(...), current_user: dict =
         {"_id": ObjectId(current_user["_id"])},
         {"$set": {"class_level": class_data["class_level"]}}
     )
+    await invalidate_cached_user(current_user["email"])
     
     updated_user = await db.users.find_one({"_id": ObjectId(current_user["_id"])})
     updated_user["id"] = str(updated_user["_id"])
     
     return updated_user
 
+def course_card_stages(include_students: bool = False):
+    """Aggregation stages that shape course documents for list responses.
+
+    Counts come from the denormalized counters; enrollments are only joined
+    when the caller asks for the student ids themselves.
+    """
+    projection = {field: 1 for field in Course.model_fields if field not in ("id", "students")}
+    if not include_students:
+        return [{"$project": projection}]
+    projection["students"] = "$enrollments.user_id"
+    return [
+        {"$lookup": {
+            "from": "enrollments",
+            "let": {"course_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$course_id", "$$course_id"]}}},
+                {"$project": {"_id": 0, "user_id": 1}},
+            ],
+            "as": "enrollments",
+        }},
+        {"$project": projection},
+    ]
+
 @app.get("/courses", response_model=List[Course])
-async def get_courses(grade: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_courses(
+    grade: Optional[str] = None,
+    # Without a limit the whole catalog is returned, as older clients expect
+    limit: Optional[int] = Query(None, ge=1, le=COURSES_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    include_students: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
     query = {}
     if grade:
         query["grade"] = grade
-    
-    courses = []
-    async for course in db.courses.find(query):
-        course["id"] = str(course["_id"])
-        courses.append(course)
-    return courses
+    if after:
+        if not ObjectId.is_valid(after):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # ObjectIds grow with creation time, so _id doubles as a created_at key
+        query["_id"] = {"$gt": ObjectId(after)}
+    
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"_id": 1}},
+        *([{"$limit": limit}] if limit else []),
+        *course_card_stages(include_students),
+    ]
+    
+    async def loader():
+        courses = []
+        async for course in db.courses.aggregate(pipeline):
+            course["id"] = str(course["_id"])
+            courses.append(course)
+        return courses
+    
+    cache_key = f"courses:{grade}:{limit}:{after}:{include_students}"
+    courses = await cached_response(["courses"], cache_key, loader)
+    
+    headers = {}
+    if limit and len(courses) == limit:
+        headers["X-Next-Cursor"] = courses[-1]["id"]
+    return list_response(CourseList, courses, headers)
+
+@app.get("/courses/search", response_model=CourseSearchResult)
+async def search_courses(
+    q: Optional[str] = None,
+    grade: Optional[str] = None,
+    teacher_id: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = Query(COURSES_PAGE_SIZE, ge=1, le=COURSES_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_user: dict = Depends(get_current_user)
+):
+    query = {}
+    if q:
+        query["$text"] = {"$search": q}
+    if grade:
+        query["grade"] = grade
+    if teacher_id:
+        query["teacher_id"] = teacher_id
+    if min_price is not None or max_price is not None:
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
+    
+    sort = {"score": {"$meta": "textScore"}, "_id": 1} if q else {"_id": 1}
+    pipeline = [
+        {"$match": query},
+        {"$facet": {
+            "results": [
+                {"$sort": sort},
+                {"$skip": offset},
+                {"$limit": limit},
+                *course_card_stages(),
+            ],
+            "total": [{"$count": "count"}],
+            "grade": [
+                {"$sortByCount": "$grade"},
+                {"$project": {"_id": 0, "value": "$_id", "count": 1}},
+            ],
+            "price": [
+                {"$bucket": {
+                    "groupBy": "$price",
+                    "boundaries": PRICE_BAND_BOUNDARIES + [float("inf")],
+                    "default": "other",
+                    "output": {"count": {"$sum": 1}},
+                }},
+                {"$project": {"_id": 0, "min": "$_id", "count": 1}},
+            ],
+            "teacher": [
+                {"$group": {
+                    "_id": "$teacher_id",
+                    "teacher_name": {"$first": "$teacher_name"},
+                    "count": {"$sum": 1},
+                }},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": TEACHER_FACET_LIMIT},
+                {"$project": {"_id": 0, "teacher_id": "$_id", "teacher_name": 1, "count": 1}},
+            ],
+        }},
+    ]
+    
+    async def loader():
+        async for facets in db.courses.aggregate(pipeline):
+            for course in facets["results"]:
+                course["id"] = str(course["_id"])
+            total = facets["total"][0]["count"] if facets["total"] else 0
+            return {
+                "results": facets["results"],
+                "total": total,
+                "facets": {
+                    "grade": facets["grade"],
+                    "price": facets["price"],
+                    "teacher": facets["teacher"],
+                },
+            }
+    
+    cache_key = f"search:{q}:{grade}:{teacher_id}:{min_price}:{max_price}:{limit}:{offset}"
+    return await cached_response(["courses"], cache_key, loader)
 
 @app.get("/courses/{course_id}", response_model=Course)
 async def get_course(course_id: str, current_user: dict = Depends(get_current_user)):
     if not ObjectId.is_valid(course_id):
         raise HTTPException(status_code=400, detail="Invalid course ID format")
     
-    course = await db.courses.find_one({"_id": ObjectId(course_id)})
+    course = await load_course(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    course["id"] = str(course["_id"])
     return course
 
 @app.get("/course/enrolled", response_model=List[Course])
 async def get_enrolled_courses(current_user: dict = Depends(get_current_user)):
     user_id = str(current_user["_id"])
     
+    course_ids = [ObjectId(course_id) for course_id in await get_enrolled_course_ids(user_id)]
+    
     courses = []
-    async for course in db.courses.find({"students": user_id}):
+    async for course in catalog_db.courses.find({"_id": {"$in": course_ids}}):
         course["id"] = str(course["_id"])
         courses.append(course)
     
-    return courses
+    return list_response(CourseList, courses)
 
 @app.post("/courses", response_model=Course)
 async def create_course(course: CourseCreate, current_user: dict = Depends(get_current_user)):
@@ -307,10 +1876,13 @@ async def create_course(course: CourseCreate, current_user: dict = Depends(get_c
     course_dict = course.dict()
     course_dict["teacher_id"] = str(current_user["_id"])
     course_dict["teacher_name"] = current_user["name"]
-    course_dict["students"] = []
     course_dict["created_at"] = datetime.utcnow()
+    course_dict["student_count"] = 0
+    course_dict["material_count"] = 0
+    course_dict["next_session_at"] = None
     
     result = await db.courses.insert_one(course_dict)
+    await invalidate_responses("courses")
     course_dict["id"] = str(result.inserted_id)
     
     return course_dict
@@ -322,58 +1894,231 @@ async def enroll_in_course(course_id: str, current_user: dict = Depends(get_curr
     if not ObjectId.is_valid(course_id):
         raise HTTPException(status_code=400, detail="Invalid course ID format")
     
-    course = await db.courses.find_one({"_id": ObjectId(course_id)})
+    # Usually served from the response cache, leaving the upsert as the only round trip
+    course = await load_course(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    if "students" in course and user_id in course["students"]:
-        raise HTTPException(status_code=400, detail="Already enrolled in this course")
+    if not await enroll_user(user_id, course_id, course["title"], course.get("teacher_id")):
+        return {"message": "Already enrolled in this course", "course_id": course_id, "newly_enrolled": False}
     
-    await db.courses.update_one(
-        {"_id": ObjectId(course_id)},
-        {"$push": {"students": user_id}}
-    )
+    return {"message": "Successfully enrolled in course", "course_id": course_id, "newly_enrolled": True}
+
+@app.post("/courses/enroll", response_model=List[EnrollmentResult])
+async def enroll_in_courses(batch: EnrollmentBatchRequest, current_user: dict = Depends(get_current_user)):
+    if len(batch.course_ids) > MAX_ENROLLMENT_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_ENROLLMENT_BATCH} courses can be enrolled in at once"
+        )
     
-    return {"message": "Successfully enrolled in course"}
+    user_id = str(current_user["_id"])
+    course_ids = list(dict.fromkeys(batch.course_ids))
+    valid_ids = [ObjectId(course_id) for course_id in course_ids if ObjectId.is_valid(course_id)]
+    
+    courses = {}
+    teachers = {}
+    async for course in db.courses.find({"_id": {"$in": valid_ids}}, {"title": 1, "teacher_id": 1}):
+        courses[str(course["_id"])] = course["title"]
+        teachers[str(course["_id"])] = course.get("teacher_id")
+    
+    newly_enrolled = await enroll_user_in_courses(user_id, courses, teachers) if courses else set()
+    
+    results = []
+    for course_id in course_ids:
+        if not ObjectId.is_valid(course_id):
+            status_name = "invalid_id"
+        elif course_id not in courses:
+            status_name = "not_found"
+        elif course_id in newly_enrolled:
+            status_name = "enrolled"
+        else:
+            status_name = "already_enrolled"
+        results.append({"course_id": course_id, "status": status_name})
+    return results
+
+def payment_response(record: dict):
+    return {
+        "payment_id": record["payment_id"],
+        "status": record["status"],
+        "message": "Payment processed successfully",
+        "transaction_date": record["transaction_date"],
+        "course_id": record["course_id"],
+        "amount": record["amount"]
+    }
+
+async def complete_payment(record: dict, course: Optional[dict] = None):
+    # Enrollment is an idempotent upsert, so replays can safely finish a
+    # payment whose first attempt died before this point
+    if course is None:
+        # Replays and repairs run without the course at hand
+        course = await db.courses.find_one(
+            {"_id": ObjectId(record["course_id"])}, {"title": 1, "teacher_id": 1}
+        ) or {}
+    await enroll_user(
+        record["user_id"], record["course_id"], course.get("title"), course.get("teacher_id"), source="payment"
+    )
+    await db.payments.update_one({"_id": record["_id"]}, {"$set": {"enrolled": True}})
+
+async def repair_payments():
+    """Finish payments whose process died between the insert and the enrollment."""
+    # Leave in-flight requests alone; completing them twice is harmless but noisy
+    cutoff = datetime.utcnow() - timedelta(minutes=1)
+    repaired = 0
+    async for record in db.payments.find({"enrolled": False, "transaction_date": {"$lt": cutoff}}):
+        await complete_payment(record)
+        repaired += 1
+    return repaired
+
+async def replay_payment(record: dict, payment: PaymentRequest):
+    if record["course_id"] != payment.course_id or record["amount"] != payment.amount:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different payment"
+        )
+    if not record.get("enrolled"):
+        await complete_payment(record)
+    return payment_response(record)
 
 @app.post("/payments", response_model=PaymentResponse)
-async def process_payment(payment: PaymentRequest, current_user: dict = Depends(get_current_user)):
+async def process_payment(
+    payment: PaymentRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: dict = Depends(get_current_user)
+):
+    user_id = str(current_user["_id"])
+    
+    if idempotency_key:
+        existing = await db.payments.find_one({"user_id": user_id, "idempotency_key": idempotency_key})
+        if existing:
+            return await replay_payment(existing, payment)
+    
     if not ObjectId.is_valid(payment.course_id):
         raise HTTPException(status_code=400, detail="Invalid course ID format")
     
-    course = await db.courses.find_one({"_id": ObjectId(payment.course_id)})
+    course = await db.courses.find_one({"_id": ObjectId(payment.course_id)}, {"title": 1, "teacher_id": 1})
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    payment_id = str(ObjectId())
-    
     payment_record = {
-        "payment_id": payment_id,
-        "user_id": str(current_user["_id"]),
+        "payment_id": str(ObjectId()),
+        "user_id": user_id,
         "course_id": payment.course_id,
         "amount": payment.amount,
         "status": "success",
         "payment_method": payment.payment_method,
-        "transaction_date": datetime.utcnow()
+        "transaction_date": datetime.utcnow(),
+        "enrolled": False
     }
+    if idempotency_key:
+        payment_record["idempotency_key"] = idempotency_key
     
-    await db.payments.insert_one(payment_record)
+    try:
+        await db.payments.insert_one(payment_record)
+    except DuplicateKeyError:
+        # A concurrent retry with the same key won the insert
+        existing = await db.payments.find_one({"user_id": user_id, "idempotency_key": idempotency_key})
+        return await replay_payment(existing, payment)
+    
+    await complete_payment(payment_record, course)
+    return payment_response(payment_record)
+
+# Teacher analytics
+def windowed_counts(course_ids: List[str], date_field: str, since: datetime, sum_field: Optional[str] = None):
+    """$group per course: all-time and in-window totals of count (and sum_field)."""
+    in_window = {"$and": [
+        {"$gte": [f"${date_field}", since]},
+        # Rows copied by migrations.py carry the migration time, not their own
+        {"$ne": ["$source", "migration"]},
+    ]}
+    group = {
+        "_id": "$course_id",
+        "count": {"$sum": 1},
+        "window_count": {"$sum": {"$cond": [in_window, 1, 0]}},
+    }
+    if sum_field:
+        group["total"] = {"$sum": f"${sum_field}"}
+        group["window_total"] = {"$sum": {"$cond": [in_window, f"${sum_field}", 0]}}
+    return [{"$match": {"course_id": {"$in": course_ids}}}, {"$group": group}]
+
+async def grouped(collection, pipeline):
+    return {row["_id"]: row async for row in collection.aggregate(pipeline)}
+
+async def build_teacher_analytics(teacher_id: str, days: int):
+    now = datetime.utcnow()
+    since = now - timedelta(days=days)
+    courses = await catalog_db.courses.find(
+        {"teacher_id": teacher_id}, {"title": 1, "price": 1}
+    ).sort("_id", ASCENDING).to_list(length=None)
+    course_ids = [str(course["_id"]) for course in courses]
+    
+    # One aggregation per metric family, run concurrently
+    enrollments, payments, sessions, materials = await asyncio.gather(
+        grouped(catalog_db.enrollments, windowed_counts(course_ids, "created_at", since)),
+        grouped(catalog_db.payments, [
+            {"$match": {"status": "success"}},
+            *windowed_counts(course_ids, "transaction_date", since, sum_field="amount"),
+        ]),
+        grouped(catalog_db.sessions, [
+            {"$match": {"teacher_id": teacher_id, "starts_at": {"$gte": now}}},
+            {"$group": {
+                # Older sessions reference their course by title
+                "_id": {"$ifNull": ["$course_id", "$course"]},
+                "count": {"$sum": 1},
+                "window_count": {
+                    "$sum": {"$cond": [{"$lt": ["$starts_at", now + timedelta(days=days)]}, 1, 0]}
+                },
+                "next_session_at": {"$min": "$starts_at"},
+            }},
+        ]),
+        grouped(catalog_db.course_materials, windowed_counts(course_ids, "created_at", since)),
+    )
     
-    user_id = str(current_user["_id"])
-    if user_id not in course.get("students", []):
-        await db.courses.update_one(
-            {"_id": ObjectId(payment.course_id)},
-            {"$push": {"students": user_id}}
+    rows = []
+    totals = AnalyticsTotals()
+    for course, course_id in zip(courses, course_ids):
+        enrolled = enrollments.get(course_id, {})
+        paid = payments.get(course_id, {})
+        upcoming = [row for row in (sessions.get(course_id), sessions.get(course.get("title"))) if row]
+        material = materials.get(course_id, {})
+        row = CourseAnalytics(
+            course_id=course_id,
+            title=course.get("title", ""),
+            price=course.get("price"),
+            students=enrolled.get("count", 0),
+            new_students=enrolled.get("window_count", 0),
+            revenue=paid.get("total", 0),
+            window_revenue=paid.get("window_total", 0),
+            payments=paid.get("count", 0),
+            window_payments=paid.get("window_count", 0),
+            upcoming_sessions=sum(group["count"] for group in upcoming),
+            window_upcoming_sessions=sum(group["window_count"] for group in upcoming),
+            next_session_at=min((group["next_session_at"] for group in upcoming), default=None),
+            materials=material.get("count", 0),
+            new_materials=material.get("window_count", 0),
         )
+        for field in AnalyticsTotals.model_fields:
+            setattr(totals, field, getattr(totals, field) + getattr(row, field))
+        rows.append(row)
     
-    return {
-        "payment_id": payment_id,
-        "status": "success",
-        "message": "Payment processed successfully",
-        "transaction_date": datetime.utcnow(),
-        "course_id": payment.course_id,
-        "amount": payment.amount
-    }
+    return TeacherAnalytics(window_days=days, generated_at=now, totals=totals, courses=rows)
+
+@app.get("/teacher/analytics", response_model=TeacherAnalytics)
+async def get_teacher_analytics(
+    days: int = Query(30, description="Rolling window in days: 7, 30 or 90"),
+    current_user: dict = Depends(get_current_user)
+):
+    if current_user["role"] != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can view analytics")
+    if days not in ANALYTICS_WINDOWS:
+        raise HTTPException(status_code=400, detail="days must be one of 7, 30 or 90")
+    
+    key = (str(current_user["_id"]), days)
+    analytics = analytics_cache.get(key)
+    if analytics is None:
+        analytics = await build_teacher_analytics(*key)
+        analytics_cache.set(key, analytics)
+    return analytics
 
 # Course Materials Endpoints
 @app.get("/courses/{course_id}/materials", response_model=List[CourseMaterial])
@@ -381,27 +2126,34 @@ async def get_course_materials(course_id: str, current_user: dict = Depends(get_
     if not ObjectId.is_valid(course_id):
         raise HTTPException(status_code=400, detail="Invalid course ID format")
     
-    course = await db.courses.find_one({"_id": ObjectId(course_id)})
+    course = await load_course(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
     user_id = str(current_user["_id"])
     is_teacher = current_user["role"] == "teacher"
     is_course_teacher = course.get("teacher_id") == user_id
-    is_enrolled = user_id in course.get("students", [])
     
-    if not (is_teacher or is_course_teacher or is_enrolled):
+    if not (is_teacher or is_course_teacher or await is_enrolled(user_id, course_id)):
         raise HTTPException(
             status_code=403, 
             detail="You must be the teacher or enrolled in the course to view materials"
         )
     
-    materials = []
-    async for material in db.course_materials.find({"course_id": course_id}).sort("created_at", -1):
-        material["id"] = str(material["_id"])
-        materials.append(material)
+    async def loader():
+        materials = []
+        async for material in db.course_materials.find({"course_id": course_id}).sort("created_at", -1):
+            material["id"] = str(material["_id"])
+            materials.append(material)
+        return materials
     
-    return materials
+    materials = await cached_response(
+        [f"course:{course_id}"], f"materials:{course_id}", loader
+    )
+    # Signed URLs are per response, so sign copies rather than cached dicts
+    return list_response(
+        CourseMaterialList, [sign_material_url(dict(material)) for material in materials]
+    )
 
 @app.post("/courses/{course_id}/materials", response_model=CourseMaterial)
 async def create_course_material(
@@ -433,19 +2185,15 @@ async def create_course_material(
     file_url = None
     file_name = None
     file_size = None
+    file_hash = None
     
     if file:
         try:
             file_ext = file.filename.split(".")[-1] if "." in file.filename else ""
-            unique_filename = f"{uuid.uuid4()}.{file_ext}"
-            file_path = os.path.join(UPLOAD_DIR, unique_filename)
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            unique_filename, file_size, file_hash = await save_upload(file, file_ext)
             
             file_url = f"/uploads/{unique_filename}"
             file_name = file.filename
-            file_size = os.path.getsize(file_path)
             
             if not type:
                 if file_ext.lower() in ["pdf", "doc", "docx"]:
@@ -456,6 +2204,8 @@ async def create_course_material(
                     type = "video"
                 else:
                     type = "file"
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
     
@@ -468,15 +2218,94 @@ async def create_course_material(
         "file_url": file_url,
         "file_name": file_name,
         "file_size": file_size,
+        "file_hash": file_hash,
         "course_id": course_id,
         "created_at": datetime.utcnow(),
         "created_by": user_id
     }
     
     result = await db.course_materials.insert_one(material_dict)
+    await add_course_materials(course_id, 1)
     material_dict["id"] = str(result.inserted_id)
+    await publish_event(
+        "material_created",
+        [f"course:{course_id}"],
+        {"id": material_dict["id"], "course_id": course_id, "title": title, "type": type}
+    )
     
-    return material_dict
+    return sign_material_url(material_dict)
+
+def build_material(material: CourseMaterialCreate, course_id: str, user_id: str):
+    """Validate a text or link material and return the document to insert."""
+    if material.file_url:
+        raise ValueError("File materials must be uploaded individually")
+    if material.type not in MATERIAL_BATCH_TYPES:
+        raise ValueError(f"Batch materials must be one of: {', '.join(sorted(MATERIAL_BATCH_TYPES))}")
+    if material.type == "link" and not material.external_url:
+        raise ValueError("Link materials need an external_url")
+    if material.type != "link" and not material.content:
+        raise ValueError("Text materials need content")
+    
+    return {
+        "title": material.title,
+        "description": material.description,
+        "type": material.type,
+        "content": material.content,
+        "external_url": material.external_url,
+        "file_url": None,
+        "file_name": None,
+        "file_size": None,
+        "file_hash": None,
+        "course_id": course_id,
+        "created_at": datetime.utcnow(),
+        "created_by": user_id
+    }
+
+@app.post("/courses/{course_id}/materials/batch", response_model=CourseMaterialBatchResult)
+async def create_course_materials(
+    course_id: str,
+    batch: CourseMaterialBatchRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    if not ObjectId.is_valid(course_id):
+        raise HTTPException(status_code=400, detail="Invalid course ID format")
+    if len(batch.materials) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can create at most {MAX_BATCH_ITEMS} materials"
+        )
+    
+    course = await db.courses.find_one({"_id": ObjectId(course_id)}, {"teacher_id": 1})
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    
+    user_id = str(current_user["_id"])
+    if course.get("teacher_id") != user_id:
+        raise HTTPException(
+            status_code=403, 
+            detail="Only the course teacher can add materials"
+        )
+    
+    documents = []
+    errors = []
+    for index, material in enumerate(batch.materials):
+        try:
+            documents.append(build_material(material, course_id, user_id))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    
+    if documents:
+        await db.course_materials.insert_many(documents)
+        await add_course_materials(course_id, len(documents))
+    for document in documents:
+        document["id"] = str(document["_id"])
+        await publish_event(
+            "material_created",
+            [f"course:{course_id}"],
+            {"id": document["id"], "course_id": course_id, "title": document["title"], "type": document["type"]}
+        )
+    
+    return {"created": documents, "errors": errors}
 
 @app.get("/courses/{course_id}/materials/{material_id}", response_model=CourseMaterial)
 async def get_course_material(
@@ -487,16 +2316,15 @@ async def get_course_material(
     if not ObjectId.is_valid(course_id) or not ObjectId.is_valid(material_id):
         raise HTTPException(status_code=400, detail="Invalid ID format")
     
-    course = await db.courses.find_one({"_id": ObjectId(course_id)})
+    course = await load_course(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
     user_id = str(current_user["_id"])
     is_teacher = current_user["role"] == "teacher"
     is_course_teacher = course.get("teacher_id") == user_id
-    is_enrolled = user_id in course.get("students", [])
     
-    if not (is_teacher or is_course_teacher or is_enrolled):
+    if not (is_teacher or is_course_teacher or await is_enrolled(user_id, course_id)):
         raise HTTPException(
             status_code=403, 
             detail="You must be the teacher or enrolled in the course to view this material"
@@ -511,7 +2339,7 @@ async def get_course_material(
         raise HTTPException(status_code=404, detail="Material not found")
     
     material["id"] = str(material["_id"])
-    return material
+    return sign_material_url(material)
 
 @app.delete("/courses/{course_id}/materials/{material_id}")
 async def delete_course_material(
@@ -541,14 +2369,6 @@ async def delete_course_material(
     if not material:
         raise HTTPException(status_code=404, detail="Material not found")
     
-    if material.get("file_url"):
-        try:
-            file_path = material["file_url"].lstrip("/")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            logger.error(f"Error deleting file: {str(e)}")
-    
     result = await db.course_materials.delete_one({
         "_id": ObjectId(material_id),
         "course_id": course_id
@@ -556,57 +2376,183 @@ async def delete_course_material(
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Material not found")
+    await add_course_materials(course_id, -1)
+    await publish_event(
+        "material_deleted", [f"course:{course_id}"], {"id": material_id, "course_id": course_id}
+    )
+    
+    if material.get("file_url"):
+        try:
+            if material.get("file_hash"):
+                await release_upload(material["file_hash"])
+            else:
+                file_path = material["file_url"].lstrip("/")
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+        except Exception as e:
+            logger.error(f"Error deleting file: {str(e)}")
     
     return {"message": "Material deleted successfully"}
 
 # Sessions Endpoints
 @app.get("/sessions/upcoming", response_model=List[Session])
-async def get_upcoming_sessions(current_user: dict = Depends(get_current_user)):
+async def get_upcoming_sessions(
+    # Without a limit every upcoming session is returned, as older clients expect
+    limit: Optional[int] = Query(None, ge=1, le=SESSIONS_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     user_id = str(current_user["_id"])
-    today = datetime.utcnow().strftime("%Y-%m-%d")
+    now = datetime.utcnow()
     
-    query = {}
+    # Sessions still running count as upcoming; the starts_at lower bound
+    # keeps the ends_at filter inside an index range
+    query = {
+        "starts_at": {"$gte": now - timedelta(minutes=MAX_SESSION_MINUTES)},
+        "ends_at": {"$gt": now},
+    }
     if current_user["role"] == "student":
-        enrolled_courses = []
-        async for course in db.courses.find({"students": user_id}):
-            enrolled_courses.append(str(course["_id"]))
-            enrolled_courses.append(course["title"])
-        
-        query = {
-            "date": {"$gte": today},
-            "$or": [
-                {"course_id": {"$in": enrolled_courses}},
-                {"course": {"$in": enrolled_courses}}
-            ]
-        }
+        enrolled_courses = list(await get_enrolled_course_keys(user_id))
+        query["$or"] = [
+            {"course_id": {"$in": enrolled_courses}},
+            {"course": {"$in": enrolled_courses}}
+        ]
     else:
-        query = {
-            "date": {"$gte": today},
-            "teacher_id": user_id
-        }
+        query["teacher_id"] = user_id
+    
+    if after:
+        starts_at, session_id = decode_session_cursor(after)
+        query["$and"] = [{"$or": [
+            {"starts_at": {"$gt": starts_at}},
+            {"starts_at": starts_at, "_id": {"$gt": session_id}},
+        ]}]
     
     sessions = []
-    async for session in db.sessions.find(query).sort("date", 1).sort("time", 1):
+    cursor = db.sessions.find(query).sort([("starts_at", 1), ("_id", 1)])
+    if limit:
+        cursor = cursor.limit(limit)
+    async for session in cursor:
         session["id"] = str(session["_id"])
         sessions.append(session)
     
-    return sessions
+    headers = {}
+    if limit and len(sessions) == limit:
+        headers["X-Next-Cursor"] = encode_session_cursor(sessions[-1])
+    return list_response(SessionList, sessions, headers)
 
 @app.post("/sessions", response_model=Session)
 async def create_session(session: SessionCreate, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "teacher":
         raise HTTPException(status_code=400, detail="Only teachers can create sessions")
     
-    session_dict = session.dict()
-    session_dict["teacher_id"] = str(current_user["_id"])
-    session_dict["attendees"] = []
-    session_dict["meeting_link"] = f"https://meet.jit.si/learnlive-session-{ObjectId()}"
+    try:
+        session_dict = build_session(session.dict(), str(current_user["_id"]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     result = await db.sessions.insert_one(session_dict)
     session_dict["id"] = str(result.inserted_id)
+    await advance_next_session(session_dict["teacher_id"], session_dict.get("course"), session_dict["starts_at"])
+    await publish_event("session_created", session_topics(session_dict), session_event_data(session_dict))
     
     return session_dict
 
+def expand_recurrence(item: dict):
+    """Yield one session dict per occurrence of item's recurrence rule."""
+    recurrence = item.pop("recurrence", None)
+    if not recurrence:
+        yield item
+        return
+    step = RECURRENCE_STEPS.get(recurrence["frequency"])
+    if step is None:
+        raise ValueError(f"Unsupported recurrence frequency: {recurrence['frequency']}")
+    if not 0 < recurrence["count"] <= MAX_BATCH_ITEMS:
+        raise ValueError(f"Recurrence count must be between 1 and {MAX_BATCH_ITEMS}")
+    first_date = datetime.strptime(item["date"].strip(), "%Y-%m-%d")
+    for occurrence in range(recurrence["count"]):
+        # Step the local date so occurrences keep their wall-clock time across DST
+        yield {**item, "date": (first_date + occurrence * step).strftime("%Y-%m-%d")}
+
+@app.post("/sessions/batch", response_model=SessionBatchResult)
+async def create_sessions(batch: SessionBatchRequest, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "teacher":
+        raise HTTPException(status_code=400, detail="Only teachers can create sessions")
+    
+    teacher_id = str(current_user["_id"])
+    documents = []
+    errors = []
+    for index, item in enumerate(batch.sessions):
+        try:
+            documents.extend(
+                build_session(occurrence, teacher_id)
+                for occurrence in expand_recurrence(item.dict())
+            )
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+        if len(documents) > MAX_BATCH_ITEMS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"A batch can create at most {MAX_BATCH_ITEMS} sessions"
+            )
+    
+    if documents:
+        await db.sessions.insert_many(documents)
+    earliest = {}
+    for document in documents:
+        course_title = document.get("course")
+        if course_title not in earliest or document["starts_at"] < earliest[course_title]:
+            earliest[course_title] = document["starts_at"]
+    for course_title, starts_at in earliest.items():
+        await advance_next_session(str(current_user["_id"]), course_title, starts_at)
+    for document in documents:
+        document["id"] = str(document["_id"])
+        await publish_event("session_created", session_topics(document), session_event_data(document))
+    
+    return {"created": documents, "errors": errors}
+
+# Event stream
+async def event_topics(user: dict):
+    user_id = str(user["_id"])
+    topics = {f"user:{user_id}"}
+    if user["role"] == "teacher":
+        topics.add(f"teacher:{user_id}")
+        async for course in db.courses.find({"teacher_id": user_id}, {"_id": 1}):
+            topics.add(f"course:{course['_id']}")
+    else:
+        topics.update(f"course:{key}" for key in await get_enrolled_course_keys(user_id))
+    return topics
+
+async def stream_events(subscriber: EventSubscriber, request: Request):
+    # Subscribe only once the response is streaming, so the finally below
+    # always runs for a registered subscriber
+    event_hub.subscribe(subscriber)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if subscriber.dropped or await request.is_disconnected():
+                    break
+                yield ": heartbeat\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+            if subscriber.dropped and subscriber.queue.empty():
+                # Tell the client it missed events and should refetch before reconnecting
+                yield "event: overflow\ndata: {}\n\n"
+                break
+    finally:
+        event_hub.unsubscribe(subscriber)
+
+@app.get("/events")
+async def get_events(request: Request, current_user: dict = Depends(get_current_user)):
+    subscriber = EventSubscriber(await event_topics(current_user))
+    return StreamingResponse(
+        stream_events(subscriber, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/sessions/{session_id}", response_model=Session)
 async def get_session(session_id: str, current_user: dict = Depends(get_current_user)):
     session = await db.sessions.find_one({"_id": ObjectId(session_id)})
@@ -617,10 +2563,7 @@ async def get_session(session_id: str, current_user: dict = Depends(get_current_
     session["id"] = str(session["_id"])
     
     if current_user["role"] == "student":
-        enrolled_courses = []
-        async for course in db.courses.find({"students": str(current_user["_id"])}):
-            enrolled_courses.append(str(course["_id"]))
-            enrolled_courses.append(course["title"])
+        enrolled_courses = await get_enrolled_course_keys(str(current_user["_id"]))
         
         if session.get("course_id") not in enrolled_courses and session.get("course") not in enrolled_courses:
             raise HTTPException(
@@ -630,31 +2573,321 @@ async def get_session(session_id: str, current_user: dict = Depends(get_current_
     
     return session
 
+# Attendance
+class AttendanceBuffer:
+    """Coalesces join/heartbeat/leave events per (session, user) until the next flush.
+
+    A whole class joining in the same minute becomes one unordered bulk_write
+    of upserts into the attendance collection instead of a write per request.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.flush_requested = asyncio.Event()
+        self.lock = asyncio.Lock()
+
+    def record(self, session_id: str, user_id: str, role: str, event: str, at: datetime):
+        entry = self.pending.get((session_id, user_id))
+        if entry is None:
+            entry = self.pending[(session_id, user_id)] = {
+                "role": role, "first_joined_at": None, "last_seen_at": None,
+                "left_at": None, "joins": 0,
+            }
+        if event == "join":
+            entry["joins"] += 1
+            if entry["first_joined_at"] is None:
+                entry["first_joined_at"] = at
+            entry["last_seen_at"] = at
+        elif event == "heartbeat":
+            entry["last_seen_at"] = at
+        else:
+            entry["left_at"] = at
+        if len(self.pending) >= ATTENDANCE_FLUSH_MAX_PENDING:
+            self.flush_requested.set()
+
+    def _merge(self, key, entry):
+        current = self.pending.get(key)
+        if current is None:
+            self.pending[key] = entry
+            return
+        current["joins"] += entry["joins"]
+        for field, pick in (("first_joined_at", min), ("last_seen_at", max), ("left_at", max)):
+            values = [value for value in (current[field], entry[field]) if value is not None]
+            current[field] = pick(values) if values else None
+
+    async def flush(self):
+        async with self.lock:
+            self.flush_requested.clear()
+            if not self.pending:
+                return 0
+            batch, self.pending = self.pending, {}
+            operations = []
+            for (session_id, user_id), entry in batch.items():
+                update = {
+                    "$setOnInsert": {"role": entry["role"]},
+                    "$inc": {"joins": entry["joins"]},
+                }
+                if entry["first_joined_at"] is not None:
+                    update["$min"] = {"first_joined_at": entry["first_joined_at"]}
+                latest = {
+                    field: entry[field] for field in ("last_seen_at", "left_at") if entry[field] is not None
+                }
+                if latest:
+                    update["$max"] = latest
+                operations.append(
+                    UpdateOne({"session_id": session_id, "user_id": user_id}, update, upsert=True)
+                )
+            try:
+                await db.attendance.bulk_write(operations, ordered=False)
+            except Exception as e:
+                # Keep the events for the next flush rather than losing attendance
+                logger.error(f"Attendance flush of {len(operations)} records failed: {str(e)}")
+                for key, entry in batch.items():
+                    self._merge(key, entry)
+                return 0
+            return len(operations)
+
+attendance_buffer = AttendanceBuffer()
+
+async def flush_attendance_periodically():
+    while True:
+        try:
+            await asyncio.wait_for(
+                attendance_buffer.flush_requested.wait(), timeout=ATTENDANCE_FLUSH_SECONDS
+            )
+        except asyncio.TimeoutError:
+            pass
+        await attendance_buffer.flush()
+
+# session_id -> fields needed to authorize attendance; sessions are immutable once created
+session_access_cache = TTLCache(ENROLLMENT_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+
+async def get_session_access(session_id: str):
+    if not ObjectId.is_valid(session_id):
+        raise HTTPException(status_code=400, detail="Invalid session ID")
+    session = session_access_cache.get(session_id)
+    if session is None:
+        session = await db.sessions.find_one(
+            {"_id": ObjectId(session_id)},
+            {"teacher_id": 1, "course_id": 1, "course": 1, "starts_at": 1, "ends_at": 1}
+        )
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        session_access_cache.set(session_id, session)
+    return session
+
+ATTENDANCE_STATUS = {"join": "joined", "heartbeat": "present", "leave": "left"}
+
+async def record_attendance(session_id: str, current_user: dict, event: str):
+    session = await get_session_access(session_id)
+    user_id = str(current_user["_id"])
+    
+    if current_user["role"] == "student":
+        enrolled_courses = await get_enrolled_course_keys(user_id)
+        if session.get("course_id") not in enrolled_courses and session.get("course") not in enrolled_courses:
+            raise HTTPException(
+                status_code=403,
+                detail="You must be enrolled in the course to attend this session"
+            )
+    elif session["teacher_id"] != user_id:
+        raise HTTPException(status_code=403, detail="You can only attend your own sessions")
+    
+    now = datetime.utcnow()
+    grace = timedelta(minutes=ATTENDANCE_GRACE_MINUTES)
+    if not session.get("starts_at") or not session["starts_at"] - grace <= now <= session["ends_at"] + grace:
+        raise HTTPException(status_code=409, detail="Session is not in progress")
+    
+    attendance_buffer.record(session_id, user_id, current_user["role"], event, now)
+    return {"status": ATTENDANCE_STATUS[event], "heartbeat_seconds": ATTENDANCE_HEARTBEAT_SECONDS}
+
+@app.post("/sessions/{session_id}/attendance/join", response_model=AttendanceAck)
+async def join_session(session_id: str, current_user: dict = Depends(get_current_user)):
+    return await record_attendance(session_id, current_user, "join")
+
+@app.post("/sessions/{session_id}/attendance/heartbeat", response_model=AttendanceAck)
+async def session_heartbeat(session_id: str, current_user: dict = Depends(get_current_user)):
+    return await record_attendance(session_id, current_user, "heartbeat")
+
+@app.post("/sessions/{session_id}/attendance/leave", response_model=AttendanceAck)
+async def leave_session(session_id: str, current_user: dict = Depends(get_current_user)):
+    return await record_attendance(session_id, current_user, "leave")
+
+def attendance_summary_pipeline(session_id: str, now: datetime):
+    # Present: seen within two heartbeat intervals and not left since
+    present = {
+        "$and": [
+            {"$gte": ["$last_seen_at", now - timedelta(seconds=2 * ATTENDANCE_HEARTBEAT_SECONDS)]},
+            {"$gt": ["$last_seen_at", {"$ifNull": ["$left_at", datetime(1970, 1, 1)]}]},
+        ]
+    }
+    # Time from first join to the last sign of the attendee (leave or heartbeat)
+    last_activity = {"$max": ["$last_seen_at", "$left_at"]}
+    first_activity = {"$ifNull": ["$first_joined_at", "$last_seen_at"]}
+    return [
+        {"$match": {"session_id": session_id}},
+        {"$set": {
+            "minutes_present": {"$ifNull": [
+                {"$divide": [{"$subtract": [last_activity, first_activity]}, 60 * 1000]}, 0
+            ]},
+            "present": present,
+        }},
+        {"$facet": {
+            "summary": [
+                {"$match": {"role": "student"}},
+                {"$group": {
+                    "_id": None,
+                    "attendee_count": {"$sum": 1},
+                    "present_count": {"$sum": {"$cond": ["$present", 1, 0]}},
+                    "average_minutes": {"$avg": "$minutes_present"},
+                    "first_joined_at": {"$min": "$first_joined_at"},
+                }},
+            ],
+            "attendees": [
+                {"$sort": {"first_joined_at": 1}},
+                {"$lookup": {
+                    "from": "users",
+                    "let": {"user_id": {"$toObjectId": "$user_id"}},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$_id", "$$user_id"]}}},
+                        {"$project": {"_id": 0, "name": 1}},
+                    ],
+                    "as": "user",
+                }},
+                {"$project": {
+                    "_id": 0,
+                    "user_id": 1,
+                    "name": {"$first": "$user.name"},
+                    "role": 1,
+                    "first_joined_at": 1,
+                    "last_seen_at": 1,
+                    "left_at": 1,
+                    "joins": 1,
+                    "minutes_present": 1,
+                    "present": 1,
+                }},
+            ],
+        }},
+    ]
+
+@app.get("/sessions/{session_id}/attendance", response_model=AttendanceSummary)
+async def get_session_attendance(session_id: str, current_user: dict = Depends(get_current_user)):
+    session = await get_session_access(session_id)
+    
+    if current_user["role"] != "teacher" or session["teacher_id"] != str(current_user["_id"]):
+        raise HTTPException(status_code=403, detail="Only the session's teacher can view attendance")
+    
+    # Include events still waiting in the buffer
+    await attendance_buffer.flush()
+    pipeline = attendance_summary_pipeline(session_id, datetime.utcnow())
+    result = await db.attendance.aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {"summary": [], "attendees": []}
+    summary = facets["summary"][0] if facets["summary"] else {}
+    summary.pop("_id", None)
+    return {"session_id": session_id, **summary, "attendees": facets["attendees"]}
+
 # Root endpoint
 @app.get("/")
 async def root():
     return {"message": "Welcome to LearnLive API"}
 
-# Static files serving
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+@app.get("/ready")
+async def readiness():
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), timeout=2)
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {str(e)}")
+        return Response(
+            content=json.dumps({"status": "unavailable"}),
+            status_code=503,
+            media_type="application/json"
+        )
+    return {"status": "ready"}
+
+@app.get("/metrics")
+async def get_metrics():
+    body = "\n".join(metric.render() for metric in METRICS) + "\n"
+    return Response(content=body, media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/cache")
+async def get_cache_stats():
+    return {
+        "user_cache": user_cache.stats(),
+        "enrolled_course_cache": enrolled_course_cache.stats(),
+        "session_access_cache": session_access_cache.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "attendance_pending": len(attendance_buffer.pending),
+        "response_cache": await response_cache.stats(),
+    }
+
+# Material file serving
+CONTENT_ADDRESSED_NAME = re.compile(r"^([0-9a-f]{64})(-[0-9a-f]{24})?(\.[^/]*)?$")
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
 
-# Port finding and server startup
-def find_available_port(start_port: int, max_port: int = 65535) -> Optional[int]:
-    for port in range(start_port, max_port + 1):
+def is_not_modified(request: Request, etag: str, mtime: float):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind(('0.0.0.0', port))
-                return port
-        except OSError:
-            continue
-    return None
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
 
-if __name__ == "__main__":
+@app.api_route("/uploads/{file_name}", methods=["GET", "HEAD"])
+async def serve_upload(file_name: str, request: Request):
+    if "/" in file_name or file_name.startswith("."):
+        raise HTTPException(status_code=404, detail="File not found")
+    verify_download_signature(file_name, request)
+    file_path = os.path.join(UPLOAD_DIR, file_name)
+    try:
+        stat_result = await asyncio.to_thread(os.stat, file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    content_addressed = CONTENT_ADDRESSED_NAME.match(file_name)
+    if content_addressed:
+        etag = f'"{content_addressed.group(1)}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'"{int(stat_result.st_mtime)}-{stat_result.st_size}"'
+        cache_control = "private, no-cache"
+    
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+    }
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+    
+    # FileResponse answers Range/If-Range requests (checked against our etag)
+    # and hands whole files to the server via http.response.pathsend when
+    # it offers that extension. uvicorn does not, so it streams chunks from
+    # a worker thread; zero-copy sendfile needs a pathsend-capable server.
+    media_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    return FileResponse(file_path, headers=headers, media_type=media_type, stat_result=stat_result)
+
+# Server startup
+def serve(config: Settings = settings):
     import uvicorn
     
-    port = find_available_port(5000)
-    if port is None:
-        raise RuntimeError("No available ports found")
-    
-    print(f"Starting server on port {port}")
-    uvicorn.run(app, host="192.168.29.176", port=port)
\ No newline at end of file
+    check_shared_caches(config)
+    logger.info(f"Starting {config.workers} worker(s) on {config.host}:{config.port}")
+    # "auto" picks uvloop and httptools when they are installed
+    uvicorn.run(
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=config.host,
+        port=config.port,
+        workers=config.workers,
+        loop="auto",
+        http="auto",
+        timeout_graceful_shutdown=config.graceful_shutdown_seconds,
+    )
+
+if __name__ == "__main__":
+    serve()
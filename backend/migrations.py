@@ -0,0 +1,87 @@
+"""One-off data migrations.
+
+Usage: python migrations.py <name>
+"""
+import asyncio
+import sys
+from datetime import timedelta
+
+from pymongo import UpdateOne
+
+import main
+from main import connect_mongo, close_mongo, ensure_indexes, logger, parse_session_start
+
+
+async def migrate_enrollments():
+    """Move courses.students arrays into the enrollments collection."""
+    migrated = 0
+    async for course in main.db.courses.find({"students": {"$exists": True}}, {"students": 1}):
+        course_id = str(course["_id"])
+        operations = [
+            UpdateOne(
+                {"user_id": user_id, "course_id": course_id},
+                # The original enrollment time is unknown; don't pass it off as now
+                {"$setOnInsert": {"source": "migration", "created_at": None}},
+                upsert=True
+            )
+            for user_id in set(course.get("students") or [])
+        ]
+        if operations:
+            result = await main.db.enrollments.bulk_write(operations, ordered=False)
+            migrated += result.upserted_count
+        await main.db.courses.update_one({"_id": course["_id"]}, {"$unset": {"students": ""}})
+    logger.info(f"Migrated {migrated} enrollments")
+
+
+async def backfill_session_times():
+    """Set starts_at/ends_at on sessions that only have date/time strings."""
+    operations = []
+    skipped = 0
+    async for session in main.db.sessions.find({"starts_at": {"$exists": False}}):
+        try:
+            starts_at = parse_session_start(
+                session["date"], session["time"], session.get("timezone")
+            )
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Skipping session {session['_id']}: {e}")
+            skipped += 1
+            continue
+        ends_at = starts_at + timedelta(minutes=session.get("duration") or 0)
+        operations.append(UpdateOne(
+            {"_id": session["_id"]},
+            {"$set": {"starts_at": starts_at, "ends_at": ends_at}}
+        ))
+    if operations:
+        await main.db.sessions.bulk_write(operations, ordered=False)
+    logger.info(f"Backfilled {len(operations)} sessions, skipped {skipped}")
+
+
+
+async def backfill_course_counters():
+    """Populate student_count, material_count and next_session_at on courses."""
+    repaired = await main.reconcile_course_counters()
+    logger.info(f"Backfilled counters on {repaired} courses")
+
+
+MIGRATIONS = {
+    "enrollments": migrate_enrollments,
+    "session_times": backfill_session_times,
+    "course_counters": backfill_course_counters,
+}
+
+
+async def run(names):
+    connect_mongo()
+    await ensure_indexes()
+    for name in names:
+        await MIGRATIONS[name]()
+    close_mongo()
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:]
+    unknown = [name for name in names if name not in MIGRATIONS]
+    if not names or unknown:
+        print(f"Usage: python migrations.py [{'|'.join(MIGRATIONS)}] ...")
+        sys.exit(1)
+    asyncio.run(run(names))
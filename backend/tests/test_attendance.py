@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import main
+
+START = datetime(2024, 1, 30, 10, 0)
+
+
+def at(minutes):
+    return START + timedelta(minutes=minutes)
+
+
+def test_record_coalesces_events_per_session_and_user():
+    buffer = main.AttendanceBuffer()
+
+    buffer.record("s1", "u1", "student", "join", at(0))
+    buffer.record("s1", "u1", "student", "heartbeat", at(5))
+    buffer.record("s1", "u1", "student", "leave", at(30))
+    buffer.record("s1", "u1", "student", "join", at(35))
+
+    assert buffer.pending == {
+        ("s1", "u1"): {
+            "role": "student",
+            "first_joined_at": at(0),
+            "last_seen_at": at(35),
+            "left_at": at(30),
+            "joins": 2,
+        }
+    }
+
+
+def test_record_requests_flush_when_buffer_is_full(monkeypatch):
+    monkeypatch.setattr(main, "ATTENDANCE_FLUSH_MAX_PENDING", 2)
+    buffer = main.AttendanceBuffer()
+
+    buffer.record("s1", "u1", "student", "join", at(0))
+    buffer.record("s1", "u1", "student", "heartbeat", at(1))
+    assert not buffer.flush_requested.is_set()
+
+    buffer.record("s1", "u2", "student", "join", at(1))
+    assert buffer.flush_requested.is_set()
+
+
+def test_merge_keeps_earliest_join_and_latest_activity():
+    buffer = main.AttendanceBuffer()
+    buffer.record("s1", "u1", "student", "join", at(10))
+    buffer.record("s1", "u1", "student", "leave", at(20))
+
+    # A failed flush puts its batch back on top of events recorded meanwhile
+    buffer._merge(("s1", "u1"), {
+        "role": "student", "first_joined_at": at(0), "last_seen_at": at(5),
+        "left_at": None, "joins": 1,
+    })
+
+    entry = buffer.pending[("s1", "u1")]
+    assert entry["first_joined_at"] == at(0)
+    assert entry["last_seen_at"] == at(10)
+    assert entry["left_at"] == at(20)
+    assert entry["joins"] == 2
+
+
+def test_merge_adds_unseen_keys():
+    buffer = main.AttendanceBuffer()
+    entry = {"role": "teacher", "first_joined_at": None, "last_seen_at": None, "left_at": at(3), "joins": 0}
+
+    buffer._merge(("s1", "t1"), entry)
+
+    assert buffer.pending == {("s1", "t1"): entry}
@@ -0,0 +1,127 @@
+import asyncio
+
+import main
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_hits_misses_and_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(main.time, "monotonic", clock)
+    cache = main.TTLCache(ttl=10, max_entries=10)
+
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.peek("a") == 1
+
+    clock.now += 11
+    assert cache.peek("a") is None
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = main.TTLCache(ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.peek("a") == 1
+    assert cache.peek("b") is None
+    assert cache.peek("c") == 3
+
+
+def test_ttl_cache_invalidate_and_clear():
+    cache = main.TTLCache(ttl=60, max_entries=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.invalidate("a")
+    assert cache.peek("a") is None
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def event(topics, follow=None):
+    return {"type": "test", "topics": topics, "data": {}, "follow": follow or {}}
+
+
+def test_dispatch_delivers_by_topic_and_applies_follow_to_owner_only():
+    hub = main.EventHub()
+    student = main.EventSubscriber({"user:s1"})
+    teacher = main.EventSubscriber({"user:t1"})
+    hub.subscribe(student)
+    hub.subscribe(teacher)
+
+    hub.dispatch(event(["user:s1", "user:t1"], follow={"user:s1": ["course:c1"]}))
+
+    assert student.topics == {"user:s1", "course:c1"}
+    assert teacher.topics == {"user:t1"}
+    assert student.queue.qsize() == teacher.queue.qsize() == 1
+
+    hub.dispatch(event(["course:c1"]))
+    assert student.queue.qsize() == 2
+    assert teacher.queue.qsize() == 1
+
+    hub.unsubscribe(student)
+    hub.unsubscribe(teacher)
+    assert not hub.by_topic
+
+
+def test_dispatch_drops_subscribers_that_fall_behind(monkeypatch):
+    monkeypatch.setattr(main, "EVENT_QUEUE_SIZE", 1)
+    hub = main.EventHub()
+    subscriber = main.EventSubscriber({"course:c1"})
+    hub.subscribe(subscriber)
+    dropped_before = main.event_subscribers_dropped.values[()]
+
+    hub.dispatch(event(["course:c1"]))
+    hub.dispatch(event(["course:c1"]))
+    hub.dispatch(event(["course:c1"]))
+
+    assert subscriber.dropped
+    assert subscriber.queue.qsize() == 1
+    assert main.event_subscribers_dropped.values[()] == dropped_before + 1
+    hub.unsubscribe(subscriber)
+
+
+def test_event_subscriber_queue_is_consumable():
+    subscriber = main.EventSubscriber({"course:c1"})
+    subscriber.queue.put_nowait(event(["course:c1"]))
+
+    assert asyncio.run(subscriber.queue.get())["type"] == "test"
+
+
+def test_metric_render_escapes_label_values():
+    metric = main.Metric("jobs_total", "Jobs run.", "counter", ("queue",))
+    metric.inc('say "hi"')
+    metric.inc('say "hi"', amount=2)
+
+    assert metric.render() == (
+        "# HELP jobs_total Jobs run.\n"
+        "# TYPE jobs_total counter\n"
+        'jobs_total{queue="say \\"hi\\""} 3.0'
+    )
+
+
+def test_histogram_render_is_cumulative():
+    histogram = main.Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/x")
+    histogram.observe(0.5, "/x")
+    histogram.observe(5, "/x")
+
+    assert histogram.render().splitlines()[2:] == [
+        'latency_seconds_bucket{route="/x",le="0.1"} 1',
+        'latency_seconds_bucket{route="/x",le="1.0"} 2',
+        'latency_seconds_bucket{route="/x",le="+Inf"} 3',
+        'latency_seconds_sum{route="/x"} 5.55',
+        'latency_seconds_count{route="/x"} 3',
+    ]
@@ -0,0 +1,69 @@
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def signed_request(material):
+    url = urlsplit(main.sign_material_url(material)["file_url"])
+    return url.path.rsplit("/", 1)[-1], dict(parse_qsl(url.query))
+
+
+def make_material():
+    return {"_id": "m1", "course_id": "c1", "file_url": "/uploads/abc-123.pdf"}
+
+
+def test_signed_url_verifies():
+    file_name, params = signed_request(make_material())
+
+    assert file_name == "abc-123.pdf"
+    assert int(params["expires"]) % main.DOWNLOAD_URL_BUCKET_SECONDS == 0
+    main.verify_download_signature(file_name, SimpleNamespace(query_params=params))
+
+
+def test_materials_without_files_are_left_alone():
+    material = {"_id": "m1", "course_id": "c1", "file_url": None}
+
+    assert main.sign_material_url(material) == material
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda params: params.update(course="c2"),
+    lambda params: params.update(material="m2"),
+    lambda params: params.update(sig="0" * 64),
+    lambda params: params.update(sig="é" * 64),
+    lambda params: params.update(expires="soon"),
+    lambda params: params.pop("sig"),
+])
+def test_tampered_links_are_forbidden(tamper):
+    file_name, params = signed_request(make_material())
+    tamper(params)
+
+    with pytest.raises(HTTPException) as error:
+        main.verify_download_signature(file_name, SimpleNamespace(query_params=params))
+    assert error.value.status_code == 403
+
+
+def test_link_for_another_file_is_forbidden():
+    _, params = signed_request(make_material())
+
+    with pytest.raises(HTTPException):
+        main.verify_download_signature("other.pdf", SimpleNamespace(query_params=params))
+
+
+def test_expired_link_is_forbidden():
+    expires = int(time.time()) - 1
+    params = {
+        "course": "c1",
+        "material": "m1",
+        "expires": str(expires),
+        "sig": main._download_signature("abc-123.pdf", "c1", "m1", expires),
+    }
+
+    with pytest.raises(HTTPException) as error:
+        main.verify_download_signature("abc-123.pdf", SimpleNamespace(query_params=params))
+    assert error.value.status_code == 403
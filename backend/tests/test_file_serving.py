@@ -0,0 +1,33 @@
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import main
+
+ETAG = '"abc123"'
+MTIME = 1_700_000_000.5
+
+
+def request(**headers):
+    return SimpleNamespace(headers={name.replace("_", "-"): value for name, value in headers.items()})
+
+
+def test_matching_etag_is_not_modified():
+    assert main.is_not_modified(request(if_none_match=ETAG), ETAG, MTIME)
+    assert main.is_not_modified(request(if_none_match=f'"other", W/{ETAG}'), ETAG, MTIME)
+    assert main.is_not_modified(request(if_none_match="*"), ETAG, MTIME)
+
+
+def test_different_etag_wins_over_modified_since():
+    headers = request(if_none_match='"other"', if_modified_since=formatdate(MTIME + 60, usegmt=True))
+
+    assert not main.is_not_modified(headers, ETAG, MTIME)
+
+
+def test_modified_since():
+    assert main.is_not_modified(request(if_modified_since=formatdate(MTIME, usegmt=True)), ETAG, MTIME)
+    assert not main.is_not_modified(request(if_modified_since=formatdate(MTIME - 60, usegmt=True)), ETAG, MTIME)
+
+
+def test_unparseable_or_missing_validators():
+    assert not main.is_not_modified(request(if_modified_since="yesterday"), ETAG, MTIME)
+    assert not main.is_not_modified(request(), ETAG, MTIME)
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+import main
+
+
+def test_parse_session_start_follows_dst():
+    # New York springs forward at 02:00 on 2024-03-10
+    assert main.parse_session_start("2024-03-09", "09:00", "America/New_York") == datetime(2024, 3, 9, 14, 0)
+    assert main.parse_session_start("2024-03-11", "09:00", "America/New_York") == datetime(2024, 3, 11, 13, 0)
+
+
+def test_parse_session_start_accepts_twelve_hour_times():
+    assert main.parse_session_start("2024-07-01", "2:30 PM", "UTC") == datetime(2024, 7, 1, 14, 30)
+    assert main.parse_session_start("2024-07-01", "14:30:15", "UTC") == datetime(2024, 7, 1, 14, 30, 15)
+
+
+def test_parse_session_start_rejects_unknown_formats():
+    with pytest.raises(ValueError):
+        main.parse_session_start("01/07/2024", "14:30", "UTC")
+
+
+def test_weekly_recurrence_keeps_wall_clock_time_across_dst():
+    item = {
+        "title": "Algebra",
+        "date": "2024-03-03",
+        "time": "09:00",
+        "timezone": "America/New_York",
+        "recurrence": {"frequency": "weekly", "count": 3},
+    }
+
+    occurrences = list(main.expand_recurrence(item))
+
+    assert [occurrence["date"] for occurrence in occurrences] == ["2024-03-03", "2024-03-10", "2024-03-17"]
+    assert all(occurrence["time"] == "09:00" for occurrence in occurrences)
+    assert all("recurrence" not in occurrence for occurrence in occurrences)
+    starts = [main.parse_session_start(o["date"], o["time"], o["timezone"]) for o in occurrences]
+    assert [start.hour for start in starts] == [14, 13, 13]
+
+
+def test_daily_recurrence_crosses_month_end():
+    item = {"date": "2024-01-30", "time": "10:00", "recurrence": {"frequency": "daily", "count": 3}}
+
+    assert [o["date"] for o in main.expand_recurrence(item)] == ["2024-01-30", "2024-01-31", "2024-02-01"]
+
+
+def test_item_without_recurrence_is_yielded_once():
+    item = {"date": "2024-01-30", "time": "10:00"}
+
+    assert list(main.expand_recurrence(item)) == [item]
+
+
+@pytest.mark.parametrize("recurrence", [
+    {"frequency": "monthly", "count": 2},
+    {"frequency": "daily", "count": 0},
+    {"frequency": "daily", "count": main.MAX_BATCH_ITEMS + 1},
+])
+def test_invalid_recurrence_is_rejected(recurrence):
+    item = {"date": "2024-01-30", "time": "10:00", "recurrence": recurrence}
+
+    with pytest.raises(ValueError):
+        list(main.expand_recurrence(item))
+
+
+def test_build_session_rejects_unknown_timezone():
+    session = {"date": "2024-01-30", "time": "10:00", "duration": 60, "timezone": "Mars/Olympus"}
+
+    with pytest.raises(ValueError, match="Unknown timezone"):
+        main.build_session(session, "teacher")
+
+
+def test_build_session_sets_end_from_duration():
+    session = {"date": "2024-01-30", "time": "10:00", "duration": 90, "timezone": "UTC"}
+
+    document = main.build_session(session, "teacher")
+
+    assert document["starts_at"] == datetime(2024, 1, 30, 10, 0)
+    assert document["ends_at"] == datetime(2024, 1, 30, 11, 30)
+    assert document["teacher_id"] == "teacher"
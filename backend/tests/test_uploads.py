@@ -0,0 +1,124 @@
+import asyncio
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from pymongo import ReturnDocument
+
+import main
+
+
+class FakeMaterialFiles:
+    """Just enough of db.material_files for save_upload/release_upload."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def _matches(self, doc, query):
+        for key, expected in query.items():
+            if isinstance(expected, dict) and "$lte" in expected:
+                if doc.get(key) is None or doc[key] > expected["$lte"]:
+                    return False
+            elif doc.get(key) != expected:
+                return False
+        return True
+
+    def _apply(self, doc, update):
+        for key, amount in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + amount
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=ReturnDocument.BEFORE):
+        doc = self.docs.get(query["_id"])
+        if doc is not None and self._matches(doc, query):
+            before = dict(doc)
+            self._apply(doc, update)
+            return dict(doc) if return_document == ReturnDocument.AFTER else before
+        if not upsert:
+            return None
+        doc = {"_id": query["_id"], **update.get("$setOnInsert", {})}
+        self._apply(doc, update)
+        self.docs[doc["_id"]] = doc
+        return dict(doc) if return_document == ReturnDocument.AFTER else None
+
+    async def update_one(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is not None:
+            self._apply(doc, update)
+
+    async def find_one_and_delete(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc is not None and self._matches(doc, query):
+            return self.docs.pop(query["_id"])
+        return None
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    files = FakeMaterialFiles()
+    monkeypatch.setattr(main, "db", SimpleNamespace(material_files=files))
+    monkeypatch.setattr(main, "UPLOAD_DIR", str(tmp_path))
+    return files
+
+
+def upload(data: bytes):
+    return UploadFile(file=io.BytesIO(data), filename="notes.pdf")
+
+
+def stored_files(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if not name.startswith("."))
+
+
+def test_identical_uploads_share_one_file(store, tmp_path):
+    first = asyncio.run(main.save_upload(upload(b"same bytes"), "pdf"))
+    second = asyncio.run(main.save_upload(upload(b"same bytes"), "pdf"))
+
+    assert first == second
+    file_name, size, file_hash = first
+    assert size == len(b"same bytes")
+    assert main.CONTENT_ADDRESSED_NAME.match(file_name).group(1) == file_hash
+    assert stored_files(tmp_path) == [file_name]
+    assert store.docs[file_hash]["refs"] == 2
+
+
+def test_different_uploads_are_stored_separately(store, tmp_path):
+    first, _, _ = asyncio.run(main.save_upload(upload(b"one"), "pdf"))
+    second, _, _ = asyncio.run(main.save_upload(upload(b"two"), "pdf"))
+
+    assert first != second
+    assert stored_files(tmp_path) == sorted([first, second])
+
+
+def test_file_is_removed_with_its_last_reference(store, tmp_path):
+    file_name, _, file_hash = asyncio.run(main.save_upload(upload(b"shared"), "pdf"))
+    asyncio.run(main.save_upload(upload(b"shared"), "pdf"))
+
+    asyncio.run(main.release_upload(file_hash))
+    assert stored_files(tmp_path) == [file_name]
+    assert store.docs[file_hash]["refs"] == 1
+
+    asyncio.run(main.release_upload(file_hash))
+    assert stored_files(tmp_path) == []
+    assert file_hash not in store.docs
+
+
+def test_reupload_after_release_gets_a_fresh_file_name(store, tmp_path):
+    file_name, _, file_hash = asyncio.run(main.save_upload(upload(b"again"), "pdf"))
+    asyncio.run(main.release_upload(file_hash))
+
+    new_name, _, _ = asyncio.run(main.save_upload(upload(b"again"), "pdf"))
+
+    assert new_name != file_name
+    assert stored_files(tmp_path) == [new_name]
+
+
+def test_oversized_upload_is_rejected_without_writing(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 4)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.save_upload(upload(b"too large"), "pdf"))
+
+    assert error.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+    assert store.docs == {}
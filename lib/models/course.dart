@@ -7,6 +7,7 @@ class Course {
   final String? teacherId;
   final String? teacherName;
   final List<String>? students;
+  final int studentCount;
   final String? thumbnail;
 
   Course({
@@ -18,8 +19,9 @@ class Course {
     this.teacherId,
     this.teacherName,
     this.students,
+    int? studentCount,
     this.thumbnail,
-  });
+  }) : studentCount = studentCount ?? students?.length ?? 0;
 
   factory Course.fromJson(Map<String, dynamic> json) {
     return Course(
@@ -33,6 +35,7 @@ class Course {
       students: json['students'] != null
           ? List<String>.from(json['students'])
           : null,
+      studentCount: json['student_count'],
       thumbnail: json['thumbnail'],
     );
   }
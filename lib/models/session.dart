@@ -6,6 +6,7 @@ class LiveSession {
   final String? course;
   final String date;
   final String time;
+  final String? timezone;
   final int duration;
   final String teacher;
   final String? meetingLink;
@@ -20,6 +21,7 @@ class LiveSession {
     this.course,
     required this.date,
     required this.time,
+    this.timezone,
     required this.duration,
     required this.teacher,
     this.meetingLink,
@@ -36,6 +38,7 @@ class LiveSession {
       course: json['course'],
       date: json['date'],
       time: json['time'],
+      timezone: json['timezone'],
       duration: json['duration'],
       teacher: json['teacher'],
       meetingLink: json['meeting_link'],
@@ -55,6 +58,7 @@ class LiveSession {
       'course': course,
       'date': date,
       'time': time,
+      'timezone': timezone,
       'duration': duration,
       'teacher': teacher,
       'meeting_link': meetingLink,
@@ -1,5 +1,6 @@
 import 'dart:convert';
 import 'dart:io';
+import 'dart:math';
 import 'package:flutter/material.dart';
 import 'package:http/http.dart' as http;
 import 'package:flutter_dotenv/flutter_dotenv.dart';
@@ -415,11 +416,16 @@ class CourseProvider with ChangeNotifier {
       final url = Uri.parse('$apiUrl/payments');
       print('Processing payment at: $url');
       
+      // One key per payment attempt lets the server dedupe retries of it
+      final random = Random.secure();
+      final idempotencyKey = List.generate(16, (_) => random.nextInt(256).toRadixString(16).padLeft(2, '0')).join();
+      
       final response = await http.post(
         url,
         headers: {
           'Authorization': 'Bearer $token',
           'Content-Type': 'application/json',
+          'Idempotency-Key': idempotencyKey,
         },
         body: json.encode({
           'course_id': courseId,
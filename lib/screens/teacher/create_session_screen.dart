@@ -1,6 +1,7 @@
 import 'package:flutter/material.dart';
 import 'package:provider/provider.dart';
 import 'package:intl/intl.dart';
+import 'package:flutter_timezone/flutter_timezone.dart';
 import '../../models/course.dart';
 import '../../models/session.dart';
 import '../../providers/auth_provider.dart';
@@ -139,6 +140,8 @@ class _CreateSessionScreenState extends State<CreateSessionScreen> {
 
       final dateFormat = DateFormat('yyyy-MM-dd');
       final timeFormat = DateFormat('HH:mm:ss');
+      // The server needs the device's IANA zone to convert date/time to UTC
+      final timezone = await FlutterTimezone.getLocalTimezone();
 
       final newSession = LiveSession(
         id: '',
@@ -148,6 +151,7 @@ class _CreateSessionScreenState extends State<CreateSessionScreen> {
         moduleId: null,
         date: dateFormat.format(dateTime),
         time: timeFormat.format(dateTime),
+        timezone: timezone,
         duration: duration,
         teacher: authProvider.user!.name,
       );
@@ -206,7 +206,7 @@ class _TeacherDashboardState extends State<TeacherDashboard> {
                                   Icon(Icons.people, color: Color(0xFFC084FC)), // ✅ Accent 2
                                   const SizedBox(height: 8),
                                   Text(
-                                    '${teacherCourses.fold(0, (sum, course) => sum + (course.students?.length ?? 0))}',
+                                    '${teacherCourses.fold(0, (sum, course) => sum + course.studentCount)}',
                                     style: TextStyle(
                                       fontSize: 24,
                                       fontWeight: FontWeight.bold,
@@ -128,7 +128,7 @@ class TeacherCourses extends StatelessWidget {
                           const Icon(Icons.people, size: 16, color: Colors.grey),
                           const SizedBox(width: 4),
                           Text(
-                            '${course.students?.length ?? 0} students',
+                            '${course.studentCount} students',
                             style: const TextStyle(fontSize: 12, color: Colors.grey),
                           ),
                         ],